@@ -1,8 +1,206 @@
 import random
 import time
-from typing import Dict, List, Optional
+import math
+import argparse
+import asyncio
+import struct
+import os
+import json
+import csv
+import mmap
+import hashlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 from dataclasses import dataclass
-from enum import Enum
+from enum import Enum, IntEnum
+
+try:
+    import numpy as np
+except ImportError:  # Only the vectorized battle engine needs NumPy
+    np = None
+
+class EventKind(IntEnum):
+    # 0 is reserved for string-table records in BinaryEventLog
+    BATTLE_START = 1
+    BATTLE_END = 2
+    MOVE_USED = 3
+    DAMAGE = 4
+    MISSED = 5
+    NO_PP = 6
+    SUPER_EFFECTIVE = 7
+    NOT_VERY_EFFECTIVE = 8
+    CRITICAL_HIT = 9
+    STATUS_INFLICTED = 10
+    FROZEN = 11
+    PARALYZED = 12
+    BURN_DAMAGE = 13
+    POISON_DAMAGE = 14
+    ITEM_HEAL = 15
+    FULL_RESTORE = 16
+    NO_ITEM = 17
+    SWITCHED = 18
+    FAINTED = 19
+
+class Event(NamedTuple):
+    kind: EventKind
+    subject: str        # The Pokemon the event happened to (or the acting Pokemon)
+    detail: str = ""    # Move, item or status name
+    value: int = 0      # Damage or HP restored
+    side: int = 0       # Side (0 or 1) of the subject, which tells the Pokemon of a mirror match apart
+
+EVENT_TEXT = {
+    EventKind.MOVE_USED: "\n{subject} used {detail}!",
+    EventKind.MISSED: "{subject}'s attack missed!",
+    EventKind.NO_PP: "{subject} is out of PP for {detail}!",
+    EventKind.SUPER_EFFECTIVE: "It's super effective!",
+    EventKind.NOT_VERY_EFFECTIVE: "It's not very effective...",
+    EventKind.CRITICAL_HIT: "A critical hit!",
+    EventKind.STATUS_INFLICTED: "{subject} was {detail}ed!",
+    EventKind.FROZEN: "{subject} is frozen and couldn't move!",
+    EventKind.PARALYZED: "{subject} is paralyzed and couldn't move!",
+    EventKind.BURN_DAMAGE: "{subject} was hurt by its burn!",
+    EventKind.POISON_DAMAGE: "{subject} was hurt by poison!",
+    EventKind.ITEM_HEAL: "{subject} used a {detail}! HP restored by {value}!",
+    EventKind.FULL_RESTORE: "{subject} used a Full Restore! HP fully restored and status cleared!",
+    EventKind.NO_ITEM: "{subject} has no {detail} left!",
+    EventKind.SWITCHED: "\n{detail}, come back! Go, {subject}!",
+    EventKind.FAINTED: "\n{subject} fainted!",
+}
+
+# The interactive game shows these through its health bars, so only replays print them
+REPLAY_TEXT = {
+    EventKind.BATTLE_START: "\n=== {subject} vs {detail} ===",
+    EventKind.DAMAGE: "{subject} took {value} damage!",
+    EventKind.BATTLE_END: "\n{subject} won the battle!",
+}
+
+class NullSink:
+    """Discards every event; emit() skips building them altogether"""
+    active = False
+    
+    def write(self, event: Event):
+        pass
+    
+    def close(self):
+        pass
+
+class ConsoleRenderer(NullSink):
+    """Prints events as the game's battle messages; replays tag each Pokemon with its side"""
+    active = True
+    
+    def __init__(self, replay: bool = False):
+        self.replay = replay
+        self.templates = {**EVENT_TEXT, **REPLAY_TEXT} if replay else EVENT_TEXT
+    
+    def write(self, event: Event):
+        if event.kind == EventKind.BATTLE_END and not event.subject:
+            if EventKind.BATTLE_END in self.templates:
+                print("\nThe battle ended in a draw!")
+            return
+        template = self.templates.get(event.kind)
+        if template is None:
+            return
+        subject, detail = event.subject, event.detail
+        if self.replay:
+            subject = f"{subject} ({event.side})"
+            if event.kind == EventKind.BATTLE_START:
+                detail = f"{detail} ({1 - event.side})"
+            elif event.kind == EventKind.SWITCHED:
+                detail = f"{detail} ({event.side})"
+        print(template.format(subject=subject, detail=detail, value=event.value))
+
+class BinaryEventLog(NullSink):
+    """Writes events to a compact binary file.
+
+    After the magic header, each event is a '<BBHHi' record: kind, side,
+    subject and detail string ids, and value. Strings are interned. The first
+    time a string is used, a record of kind 0 with its UTF-8 length ('<BH')
+    and bytes comes before it. String id 0 is always the empty string.
+    """
+    MAGIC = b"PKEV2\n"
+    RECORD = struct.Struct('<BBHHi')
+    STRING = struct.Struct('<BH')
+    active = True
+    
+    def __init__(self, path: str):
+        self.file = open(path, 'wb')
+        self.file.write(self.MAGIC)
+        self.strings = {"": 0}
+    
+    def intern(self, text: str) -> int:
+        if text not in self.strings:
+            encoded = text.encode('utf-8')
+            self.file.write(self.STRING.pack(0, len(encoded)) + encoded)
+            self.strings[text] = len(self.strings)
+        return self.strings[text]
+    
+    def write(self, event: Event):
+        subject, detail = self.intern(event.subject), self.intern(event.detail)
+        self.file.write(self.RECORD.pack(event.kind, event.side, subject, detail, event.value))
+    
+    def close(self):
+        self.file.close()
+
+def read_event_log(path: str) -> Iterator[Event]:
+    """Decode a file written by BinaryEventLog"""
+    record, string = BinaryEventLog.RECORD, BinaryEventLog.STRING
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(b"PKEV1\n"):
+        raise ValueError(f"{path} is a version 1 event log, which does not record sides; record it again")
+    if not data.startswith(BinaryEventLog.MAGIC):
+        raise ValueError(f"{path} is not a battle event log")
+    strings = [""]
+    offset = len(BinaryEventLog.MAGIC)
+    while offset < len(data):
+        if data[offset] == 0:
+            _, length = string.unpack_from(data, offset)
+            offset += string.size
+            strings.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        else:
+            kind, side, subject, detail, value = record.unpack_from(data, offset)
+            offset += record.size
+            yield Event(EventKind(kind), strings[subject], strings[detail], value, side)
+
+def replay(path: str, sink=None, battle: Optional[int] = None) -> int:
+    """Send the events of a log (or only of battle number ``battle``) to ``sink``.
+
+    Returns the number of battles in the log.
+    """
+    sink = ConsoleRenderer(replay=True) if sink is None else sink
+    battles = 0
+    for event in read_event_log(path):
+        if event.kind == EventKind.BATTLE_START:
+            battles += 1
+        if battle is None or battle == battles:
+            sink.write(event)
+    return battles
+
+# Battle logic reports what happens through emit(); the sink decides where it goes
+event_sink = ConsoleRenderer()
+
+def emit(kind: EventKind, subject: str, detail: str = "", value: int = 0, side: int = 0):
+    if event_sink.active:
+        event_sink.write(Event(kind, subject, detail, value, side))
+
+@contextmanager
+def routed_to(sink):
+    """Send events to ``sink`` for the duration of the block"""
+    global event_sink
+    previous = event_sink
+    event_sink = sink
+    try:
+        yield sink
+    finally:
+        event_sink = previous
+
+def silenced():
+    """Discard events for the duration of the block"""
+    return routed_to(NullSink())
 
 class StatusEffect(Enum):
     BURN = "Burn"
@@ -31,12 +229,26 @@ class PokemonType(Enum):
     GRASS = "Grass"
     ELECTRIC = "Electric"
     NORMAL = "Normal"
+    ICE = "Ice"
+    FIGHTING = "Fighting"
+    POISON = "Poison"
+    GROUND = "Ground"
+    FLYING = "Flying"
+    PSYCHIC = "Psychic"
+    BUG = "Bug"
+    ROCK = "Rock"
+    GHOST = "Ghost"
+    DRAGON = "Dragon"
+    DARK = "Dark"
+    STEEL = "Steel"
+    FAIRY = "Fairy"
 
 class Item:
     def __init__(self, name: str, effect_value: int, quantity: int):
         self.name = name
         self.effect_value = effect_value
         self.quantity = quantity
+        self.max_quantity = quantity
 
 class Pokemon:
     def __init__(self, name: str, type1: PokemonType, hp: int, moves: Dict[str, Move]):
@@ -55,16 +267,17 @@ class Pokemon:
             'accuracy': 100,
             'evasion': 100
         }
+        self.side = 0  # Which side of the battle it fights on, for events
     
     def is_fainted(self) -> bool:
         return self.current_hp <= 0
     
     def can_move(self) -> bool:
         if self.status == StatusEffect.FREEZE and random.random() < 0.8:
-            print(f"{self.name} is frozen and couldn't move!")
+            emit(EventKind.FROZEN, self.name, side=self.side)
             return False
         if self.status == StatusEffect.PARALYZE and random.random() < 0.25:
-            print(f"{self.name} is paralyzed and couldn't move!")
+            emit(EventKind.PARALYZED, self.name, side=self.side)
             return False
         return True
     
@@ -72,38 +285,169 @@ class Pokemon:
         if self.status == StatusEffect.BURN:
             damage = max(1, self.max_hp // 16)
             self.current_hp = max(0, self.current_hp - damage)
-            print(f"{self.name} was hurt by its burn!")
+            emit(EventKind.BURN_DAMAGE, self.name, value=damage, side=self.side)
         elif self.status == StatusEffect.POISON:
             damage = max(1, self.max_hp // 8)
             self.current_hp = max(0, self.current_hp - damage)
-            print(f"{self.name} was hurt by poison!")
+            emit(EventKind.POISON_DAMAGE, self.name, value=damage, side=self.side)
     
     def use_item(self, item_name: str) -> bool:
         if item_name not in self.items or self.items[item_name].quantity <= 0:
-            print(f"{self.name} has no {item_name} left!")
+            emit(EventKind.NO_ITEM, self.name, item_name, side=self.side)
             return False
         
         item = self.items[item_name]
         if item_name == 'Full Restore':
             self.current_hp = self.max_hp
             self.status = StatusEffect.NONE
-            print(f"{self.name} used a Full Restore! HP fully restored and status cleared!")
+            emit(EventKind.FULL_RESTORE, self.name, item_name, side=self.side)
         else:
             heal_amount = min(item.effect_value, self.max_hp - self.current_hp)
             self.current_hp += heal_amount
-            print(f"{self.name} used a {item_name}! HP restored by {heal_amount}!")
+            emit(EventKind.ITEM_HEAL, self.name, item_name, heal_amount, self.side)
         
         item.quantity -= 1
         return True
 
+class BattleState:
+    """Packed snapshot of everything about some Pokemon that changes in battle.
+
+    Each Pokemon becomes one little-endian record: move and item counts, HP,
+    status id, the accuracy and evasion stats, then one byte of PP per move
+    and one byte per item quantity. The snapshot is an immutable bytes
+    object, so taking one is a single struct.pack per Pokemon. It can be
+    shared, used as a dict key or written out as is. stable_hash() gives the
+    same value in every process, unlike hash().
+    """
+    __slots__ = ('data',)
+    STATUSES = list(StatusEffect)
+    STATUS_IDS = {status: i for i, status in enumerate(STATUSES)}
+    COUNTS = struct.Struct('<BB')
+    _records: Dict[Tuple[int, int], struct.Struct] = {}
+    
+    def __init__(self, data: bytes):
+        self.data = data
+    
+    @classmethod
+    def record(cls, moves: int, items: int) -> struct.Struct:
+        if (moves, items) not in cls._records:
+            cls._records[moves, items] = struct.Struct(f'<BBHBHH{moves}B{items}B')
+        return cls._records[moves, items]
+    
+    @classmethod
+    def capture(cls, *pokemon: Pokemon) -> "BattleState":
+        return cls.from_sides([(p.current_hp, p.status, p.stats['accuracy'], p.stats['evasion'],
+                                [move.pp for move in p.moves.values()],
+                                [item.quantity for item in p.items.values()]) for p in pokemon])
+    
+    @classmethod
+    def from_sides(cls, sides) -> "BattleState":
+        """Inverse of sides(): pack (hp, status, accuracy, evasion, pp, item quantities) tuples"""
+        return cls(b"".join(cls.record(len(pp), len(quantities)).pack(
+            len(pp), len(quantities), hp, cls.STATUS_IDS[status], accuracy, evasion, *pp, *quantities)
+            for hp, status, accuracy, evasion, pp, quantities in sides))
+    
+    def sides(self) -> List[Tuple[int, StatusEffect, int, int, Tuple[int, ...], Tuple[int, ...]]]:
+        """(hp, status, accuracy, evasion, pp, item quantities) for each Pokemon"""
+        sides, offset = [], 0
+        while offset < len(self.data):
+            moves, items = self.COUNTS.unpack_from(self.data, offset)
+            record = self.record(moves, items)
+            values = record.unpack_from(self.data, offset)
+            offset += record.size
+            sides.append((values[2], self.STATUSES[values[3]], values[4], values[5],
+                          values[6:6 + moves], values[6 + moves:]))
+        return sides
+    
+    def restore(self, *pokemon: Pokemon):
+        """Write the snapshot back into the same Pokemon it was captured from (or ones with the same moves and items)"""
+        sides = self.sides()
+        if len(sides) != len(pokemon):
+            raise ValueError(f"Snapshot holds {len(sides)} Pokemon, not {len(pokemon)}")
+        for p, (hp, status, accuracy, evasion, pp, quantities) in zip(pokemon, sides):
+            if len(pp) != len(p.moves) or len(quantities) != len(p.items):
+                raise ValueError(f"Snapshot does not match {p.name}'s moves and items")
+            p.current_hp = hp
+            p.status = status
+            p.stats['accuracy'] = accuracy
+            p.stats['evasion'] = evasion
+            for move, left in zip(p.moves.values(), pp):
+                move.pp = left
+            for item, left in zip(p.items.values(), quantities):
+                item.quantity = left
+    
+    def stable_hash(self) -> int:
+        return int.from_bytes(hashlib.blake2b(self.data, digest_size=8).digest(), 'little')
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BattleState) and self.data == other.data
+    
+    def __hash__(self) -> int:
+        return hash(self.data)
+    
+    def __repr__(self) -> str:
+        return f"BattleState({self.stable_hash():016x})"
+
+@dataclass(frozen=True)
+class DamageDistribution:
+    """Exact outcome of calculate_damage for one move against one defender"""
+    miss: float                          # Probability the move misses
+    crit: float                          # Probability of a critical hit, given a hit
+    status: float                        # Probability the move's status is inflicted, given a hit
+    hit: Tuple[Tuple[int, float], ...]   # (damage, probability) given a hit, critical hits included
+    
+    def pmf(self) -> Dict[int, float]:
+        """Probability of each damage value, with a miss counted as 0 damage"""
+        pmf = {0: self.miss} if self.miss else {}
+        for damage, p in self.hit:
+            pmf[damage] = pmf.get(damage, 0.0) + (1 - self.miss) * p
+        return pmf
+    
+    def expected(self) -> float:
+        return (1 - self.miss) * sum(damage * p for damage, p in self.hit)
+    
+    def ko_probability(self, hp: int) -> float:
+        """Chance this move alone takes a defender at ``hp`` to 0"""
+        return (1 - self.miss) * sum(p for damage, p in self.hit if damage >= hp)
+
+def roll_pmf(damage: float) -> Dict[int, float]:
+    """Distribution of int(damage * random.uniform(0.85, 1.0))"""
+    low, high = 0.85 * damage, 1.0 * damage
+    if high <= low:
+        return {int(damage): 1.0}
+    pmf = {}
+    for value in range(int(low), math.ceil(high)):
+        overlap = min(high, value + 1) - max(low, value)
+        if overlap > 0:
+            pmf[value] = overlap / (high - low)
+    return pmf
+
+@lru_cache(maxsize=None)
+def damage_distribution(power: int, accuracy: int, effectiveness: float, stab: bool, burned: bool,
+                        status_chance: float) -> DamageDistribution:
+    """Memoized DamageDistribution, following calculate_damage step by step"""
+    crit = 0.0625
+    hit: Dict[int, float] = {}
+    for multiplier, p in ((1.0, 1 - crit), (1.5, crit)):
+        damage = power * effectiveness
+        damage *= multiplier
+        if stab:
+            damage *= 1.5
+        if burned:
+            damage *= 0.5
+        for value, q in roll_pmf(damage).items():
+            hit[value] = hit.get(value, 0.0) + p * q
+    miss = 0.0 if accuracy == 100 else max(0.0, 1 - accuracy / 100)
+    return DamageDistribution(miss, crit, status_chance, tuple(sorted(hit.items())))
+
 class BattleSystem:
-    def __init__(self):
-        self.type_effectiveness = {
-            PokemonType.FIRE: {PokemonType.GRASS: 2.0, PokemonType.WATER: 0.5, PokemonType.ELECTRIC: 1.0, PokemonType.FIRE: 0.5},
-            PokemonType.WATER: {PokemonType.FIRE: 2.0, PokemonType.GRASS: 0.5, PokemonType.ELECTRIC: 0.5, PokemonType.WATER: 0.5},
-            PokemonType.GRASS: {PokemonType.WATER: 2.0, PokemonType.FIRE: 0.5, PokemonType.ELECTRIC: 1.0, PokemonType.GRASS: 0.5},
-            PokemonType.ELECTRIC: {PokemonType.WATER: 2.0, PokemonType.GRASS: 1.0, PokemonType.FIRE: 1.0, PokemonType.ELECTRIC: 0.5}
-        }
+    def __init__(self, database: Optional["RosterDatabase"] = None):
+        database = load_database() if database is None else database
+        # Dense type chart over the database's types; pairs missing from the data are 1.0
+        self.types = database.types
+        self.type_matrix = database.type_matrix()
+        self.type_effectiveness = {attacking: dict(zip(self.types, row))
+                                   for attacking, row in zip(self.types, self.type_matrix)}
     
     def calculate_accuracy(self, move: Move, attacker: Pokemon, defender: Pokemon) -> bool:
         if move.accuracy == 100:
@@ -115,13 +459,43 @@ class BattleSystem:
         
         return random.random() < hit_chance
     
+    def damage_distribution(self, move: Move, attacker: Pokemon, defender: Pokemon,
+                            attacker_status: Optional[StatusEffect] = None,
+                            defender_status: Optional[StatusEffect] = None) -> DamageDistribution:
+        """Exact damage distribution of calculate_damage (statuses default to the Pokemon's own)"""
+        attacker_status = attacker.status if attacker_status is None else attacker_status
+        defender_status = defender.status if defender_status is None else defender_status
+        effectiveness = self.type_effectiveness.get(move.type, {}).get(defender.type1, 1.0)
+        burned = attacker_status == StatusEffect.BURN and move.type != PokemonType.NORMAL
+        status_chance = move.status_chance if move.status_effect and defender_status == StatusEffect.NONE else 0.0
+        return damage_distribution(move.power, move.accuracy, effectiveness, move.type == attacker.type1,
+                                   burned, status_chance)
+    
+    def damage_table(self, roster: Dict[str, Pokemon]) -> Dict[Tuple[str, str, str, bool, bool], DamageDistribution]:
+        """Every roster move against every defender.
+
+        Keyed by (attacker, move, defender, attacker burned, defender already
+        has a status).
+        """
+        table = {}
+        for attacker in roster.values():
+            for move in attacker.moves.values():
+                for defender in roster.values():
+                    for burned in (False, True):
+                        for statused in (False, True):
+                            table[attacker.name, move.name, defender.name, burned, statused] = self.damage_distribution(
+                                move, attacker, defender,
+                                StatusEffect.BURN if burned else StatusEffect.NONE,
+                                StatusEffect.POISON if statused else StatusEffect.NONE)
+        return table
+    
     def calculate_damage(self, move: Move, attacker: Pokemon, defender: Pokemon) -> int:
         if move.pp <= 0:
-            print(f"{attacker.name} is out of PP for {move.name}!")
+            emit(EventKind.NO_PP, attacker.name, move.name, side=attacker.side)
             return 0
         
         if not self.calculate_accuracy(move, attacker, defender):
-            print(f"{attacker.name}'s attack missed!")
+            emit(EventKind.MISSED, attacker.name, move.name, side=attacker.side)
             move.pp -= 1
             return 0
         
@@ -136,20 +510,20 @@ class BattleSystem:
                 effectiveness = self.type_effectiveness[move.type][defender.type1]
                 damage *= effectiveness
                 if effectiveness > 1:
-                    print("It's super effective!")
+                    emit(EventKind.SUPER_EFFECTIVE, defender.name, move.name, side=defender.side)
                 elif effectiveness < 1:
-                    print("It's not very effective...")
+                    emit(EventKind.NOT_VERY_EFFECTIVE, defender.name, move.name, side=defender.side)
         
         # Critical hit
         if random.random() < 0.0625:  # 1/16 chance
             damage *= 1.5
-            print("A critical hit!")
+            emit(EventKind.CRITICAL_HIT, defender.name, move.name, side=defender.side)
         
         # Status effect application
         if move.status_effect and random.random() < move.status_chance:
             if defender.status == StatusEffect.NONE:
                 defender.status = move.status_effect
-                print(f"{defender.name} was {move.status_effect.value.lower()}ed!")
+                emit(EventKind.STATUS_INFLICTED, defender.name, move.status_effect.value.lower(), side=defender.side)
         
         # STAB (Same Type Attack Bonus)
         if move.type == attacker.type1:
@@ -159,35 +533,206 @@ class BattleSystem:
         if attacker.status == StatusEffect.BURN and move.type != PokemonType.NORMAL:
             damage *= 0.5
         
-        return int(damage * random.uniform(0.85, 1.0))
-
-def create_pokemon_roster() -> Dict[str, Pokemon]:
-    return {
-        'Charizard': Pokemon('Charizard', PokemonType.FIRE, 120, {
-            'Flamethrower': Move('Flamethrower', PokemonType.FIRE, 35, 95, 10, 10, StatusEffect.BURN, 0.1),
-            'Dragon Claw': Move('Dragon Claw', PokemonType.NORMAL, 30, 100, 15, 15),
-            'Air Slash': Move('Air Slash', PokemonType.NORMAL, 25, 90, 15, 15),
-            'Fire Blast': Move('Fire Blast', PokemonType.FIRE, 45, 85, 5, 5, StatusEffect.BURN, 0.3),
-        }),
-        'Blastoise': Pokemon('Blastoise', PokemonType.WATER, 110, {
-            'Hydro Pump': Move('Hydro Pump', PokemonType.WATER, 45, 85, 5, 5),
-            'Surf': Move('Surf', PokemonType.WATER, 35, 95, 10, 10),
-            'Ice Beam': Move('Ice Beam', PokemonType.WATER, 35, 95, 10, 10, StatusEffect.FREEZE, 0.1),
-            'Water Pulse': Move('Water Pulse', PokemonType.WATER, 30, 100, 15, 15),
-        }),
-        'Venusaur': Pokemon('Venusaur', PokemonType.GRASS, 115, {
-            'Solar Beam': Move('Solar Beam', PokemonType.GRASS, 45, 85, 5, 5),
-            'Razor Leaf': Move('Razor Leaf', PokemonType.GRASS, 30, 95, 15, 15),
-            'Poison Powder': Move('Poison Powder', PokemonType.GRASS, 0, 75, 10, 10, StatusEffect.POISON, 1.0),
-            'Vine Whip': Move('Vine Whip', PokemonType.GRASS, 25, 100, 20, 20),
-        }),
-        'Pikachu': Pokemon('Pikachu', PokemonType.ELECTRIC, 90, {
-            'Thunderbolt': Move('Thunderbolt', PokemonType.ELECTRIC, 40, 95, 10, 10, StatusEffect.PARALYZE, 0.1),
-            'Quick Attack': Move('Quick Attack', PokemonType.NORMAL, 20, 100, 20, 20),
-            'Thunder Wave': Move('Thunder Wave', PokemonType.ELECTRIC, 0, 85, 15, 15, StatusEffect.PARALYZE, 1.0),
-            'Thunder': Move('Thunder', PokemonType.ELECTRIC, 50, 70, 5, 5, StatusEffect.PARALYZE, 0.3),
-        })
-    }
+        damage = int(damage * random.uniform(0.85, 1.0))
+        emit(EventKind.DAMAGE, defender.name, move.name, damage, defender.side)
+        return damage
+
+# The built-in roster, in the same layout as a roster JSON file (see load_roster_data)
+DEFAULT_ROSTER_DATA = {
+    'type_chart': [
+        ['Fire', 'Grass', 2.0], ['Fire', 'Water', 0.5], ['Fire', 'Electric', 1.0], ['Fire', 'Fire', 0.5],
+        ['Water', 'Fire', 2.0], ['Water', 'Grass', 0.5], ['Water', 'Electric', 0.5], ['Water', 'Water', 0.5],
+        ['Grass', 'Water', 2.0], ['Grass', 'Fire', 0.5], ['Grass', 'Electric', 1.0], ['Grass', 'Grass', 0.5],
+        ['Electric', 'Water', 2.0], ['Electric', 'Grass', 1.0], ['Electric', 'Fire', 1.0], ['Electric', 'Electric', 0.5],
+    ],
+    'moves': [
+        {'name': 'Flamethrower', 'type': 'Fire', 'power': 35, 'accuracy': 95, 'pp': 10, 'status': 'Burn', 'status_chance': 0.1},
+        {'name': 'Dragon Claw', 'type': 'Normal', 'power': 30, 'accuracy': 100, 'pp': 15},
+        {'name': 'Air Slash', 'type': 'Normal', 'power': 25, 'accuracy': 90, 'pp': 15},
+        {'name': 'Fire Blast', 'type': 'Fire', 'power': 45, 'accuracy': 85, 'pp': 5, 'status': 'Burn', 'status_chance': 0.3},
+        {'name': 'Hydro Pump', 'type': 'Water', 'power': 45, 'accuracy': 85, 'pp': 5},
+        {'name': 'Surf', 'type': 'Water', 'power': 35, 'accuracy': 95, 'pp': 10},
+        {'name': 'Ice Beam', 'type': 'Water', 'power': 35, 'accuracy': 95, 'pp': 10, 'status': 'Freeze', 'status_chance': 0.1},
+        {'name': 'Water Pulse', 'type': 'Water', 'power': 30, 'accuracy': 100, 'pp': 15},
+        {'name': 'Solar Beam', 'type': 'Grass', 'power': 45, 'accuracy': 85, 'pp': 5},
+        {'name': 'Razor Leaf', 'type': 'Grass', 'power': 30, 'accuracy': 95, 'pp': 15},
+        {'name': 'Poison Powder', 'type': 'Grass', 'power': 0, 'accuracy': 75, 'pp': 10, 'status': 'Poison', 'status_chance': 1.0},
+        {'name': 'Vine Whip', 'type': 'Grass', 'power': 25, 'accuracy': 100, 'pp': 20},
+        {'name': 'Thunderbolt', 'type': 'Electric', 'power': 40, 'accuracy': 95, 'pp': 10, 'status': 'Paralyze', 'status_chance': 0.1},
+        {'name': 'Quick Attack', 'type': 'Normal', 'power': 20, 'accuracy': 100, 'pp': 20},
+        {'name': 'Thunder Wave', 'type': 'Electric', 'power': 0, 'accuracy': 85, 'pp': 15, 'status': 'Paralyze', 'status_chance': 1.0},
+        {'name': 'Thunder', 'type': 'Electric', 'power': 50, 'accuracy': 70, 'pp': 5, 'status': 'Paralyze', 'status_chance': 0.3},
+    ],
+    'species': [
+        {'name': 'Charizard', 'type': 'Fire', 'hp': 120, 'moves': ['Flamethrower', 'Dragon Claw', 'Air Slash', 'Fire Blast']},
+        {'name': 'Blastoise', 'type': 'Water', 'hp': 110, 'moves': ['Hydro Pump', 'Surf', 'Ice Beam', 'Water Pulse']},
+        {'name': 'Venusaur', 'type': 'Grass', 'hp': 115, 'moves': ['Solar Beam', 'Razor Leaf', 'Poison Powder', 'Vine Whip']},
+        {'name': 'Pikachu', 'type': 'Electric', 'hp': 90, 'moves': ['Thunderbolt', 'Quick Attack', 'Thunder Wave', 'Thunder']},
+    ],
+}
+
+def load_roster_data(path: str) -> dict:
+    """Read a roster from a JSON file, or from a directory of CSV files.
+
+    JSON files use the layout of DEFAULT_ROSTER_DATA. A CSV directory holds
+    moves.csv (name,type,power,accuracy,pp,status,status_chance), species.csv
+    (name,type,hp,move1..move4) and optionally type_chart.csv
+    (attacking,defending,multiplier). Type names are PokemonType values;
+    missing type chart entries count as 1.0.
+    """
+    if not os.path.isdir(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def rows(name: str) -> List[Dict[str, str]]:
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            return []
+        with open(file_path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    
+    moves = [{'name': row['name'], 'type': row['type'], 'power': int(row['power']),
+              'accuracy': int(row['accuracy']), 'pp': int(row['pp']), 'status': row.get('status') or None,
+              'status_chance': float(row.get('status_chance') or 0.0)} for row in rows('moves.csv')]
+    species = [{'name': row['name'], 'type': row['type'], 'hp': int(row['hp']),
+                'moves': [row[f'move{i}'] for i in range(1, RosterDatabase.MOVE_SLOTS + 1) if row.get(f'move{i}')]}
+               for row in rows('species.csv')]
+    chart = [[row['attacking'], row['defending'], float(row['multiplier'])] for row in rows('type_chart.csv')]
+    return {'type_chart': chart, 'moves': moves, 'species': species}
+
+class RosterDatabase:
+    """Species, moves and the type chart compiled into fixed-width binary records.
+
+    The layout is a header, then the type table, the dense type matrix, the
+    move records, the species records, and finally a pool of UTF-8 names.
+    Types and statuses are stored as small interned ids, and names as
+    (offset, length) references into the pool. Nothing is parsed up front
+    apart from the species name index. pokemon() unpacks one species record
+    and its moves straight from the buffer, which is a memory map when the
+    database is opened from a file.
+    """
+    MAGIC = b"PKDB"
+    VERSION = 1
+    MOVE_SLOTS = 4
+    HEADER = struct.Struct('<4sHHHHI')   # magic, version, types, moves, species, name pool bytes
+    NAME = struct.Struct('<IH')          # pool offset, length
+    EFFECTIVENESS = struct.Struct('<d')
+    MOVE = struct.Struct('<IHHBBBBd')    # name, power, accuracy, pp, type id, status id, status chance
+    SPECIES = struct.Struct('<IHHBB4H')  # name, hp, type id, move count, move ids
+    STATUSES = [None, StatusEffect.BURN, StatusEffect.FREEZE, StatusEffect.PARALYZE, StatusEffect.POISON]
+    
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, n_types, n_moves, n_species, pool_size = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("Not a compiled roster database (or an incompatible version)")
+        self.matrix_offset = self.HEADER.size + n_types * self.NAME.size
+        self.moves_offset = self.matrix_offset + n_types * n_types * self.EFFECTIVENESS.size
+        self.species_offset = self.moves_offset + n_moves * self.MOVE.size
+        self.pool_offset = self.species_offset + n_species * self.SPECIES.size
+        self.types = [PokemonType(self._name(*self.NAME.unpack_from(buffer, self.HEADER.size + i * self.NAME.size)))
+                      for i in range(n_types)]
+        self.move_count = n_moves
+        self.species_names = [self._name(*self.SPECIES.unpack_from(buffer, self.species_offset + i * self.SPECIES.size)[:2])
+                              for i in range(n_species)]
+        self.species_index = {name: i for i, name in enumerate(self.species_names)}
+    
+    @classmethod
+    def open(cls, path: str) -> "RosterDatabase":
+        """Memory-map a file written by compile()"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    
+    @classmethod
+    def compile(cls, data: dict) -> bytes:
+        """Pack roster data (see load_roster_data) into the binary format"""
+        types: List[PokemonType] = []
+        pool = bytearray()
+        names: Dict[str, Tuple[int, int]] = {}
+        
+        def type_id(name: str) -> int:
+            kind = PokemonType(name)
+            if kind not in types:
+                types.append(kind)
+            return types.index(kind)
+        
+        def name_ref(text: str) -> Tuple[int, int]:
+            if text not in names:
+                encoded = text.encode('utf-8')
+                names[text] = (len(pool), len(encoded))
+                pool.extend(encoded)
+            return names[text]
+        
+        status_ids = {status.value: i for i, status in enumerate(cls.STATUSES) if status is not None}
+        move_ids = {}
+        moves = bytearray()
+        for move in data['moves']:
+            status = move.get('status')
+            if status is not None and status not in status_ids:
+                raise ValueError(f"Move {move['name']} has unknown status {status!r}")
+            move_ids[move['name']] = len(move_ids)
+            moves += cls.MOVE.pack(*name_ref(move['name']), move['power'], move['accuracy'], move['pp'],
+                                   type_id(move['type']), status_ids.get(status, 0), move.get('status_chance', 0.0))
+        species = bytearray()
+        for entry in data['species']:
+            if len(entry['moves']) > cls.MOVE_SLOTS:
+                raise ValueError(f"{entry['name']} has more than {cls.MOVE_SLOTS} moves")
+            try:
+                ids = [move_ids[name] for name in entry['moves']]
+            except KeyError as missing:
+                raise ValueError(f"{entry['name']} uses unknown move {missing}") from None
+            species += cls.SPECIES.pack(*name_ref(entry['name']), entry['hp'], type_id(entry['type']), len(ids),
+                                        *(ids + [0] * (cls.MOVE_SLOTS - len(ids))))
+        chart = [(type_id(attacking), type_id(defending), multiplier)
+                 for attacking, defending, multiplier in data.get('type_chart', [])]
+        matrix = [[1.0] * len(types) for _ in types]
+        for attacking, defending, multiplier in chart:
+            matrix[attacking][defending] = multiplier
+        
+        type_names = b"".join(cls.NAME.pack(*name_ref(kind.value)) for kind in types)
+        dense = b"".join(cls.EFFECTIVENESS.pack(value) for row in matrix for value in row)
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(types), len(move_ids), len(data['species']), len(pool))
+        return header + type_names + dense + bytes(moves) + bytes(species) + bytes(pool)
+    
+    def _name(self, offset: int, length: int) -> str:
+        start = self.pool_offset + offset
+        return bytes(self.buffer[start:start + length]).decode('utf-8')
+    
+    def type_matrix(self) -> List[List[float]]:
+        """Effectiveness of attacking type i (rows) against defending type j (columns), in self.types order"""
+        n = len(self.types)
+        values = struct.unpack_from(f'<{n * n}d', self.buffer, self.matrix_offset)
+        return [list(values[i * n:(i + 1) * n]) for i in range(n)]
+    
+    def move(self, index: int) -> Move:
+        name, length, power, accuracy, pp, type_id, status_id, chance = self.MOVE.unpack_from(
+            self.buffer, self.moves_offset + index * self.MOVE.size)
+        return Move(self._name(name, length), self.types[type_id], power, accuracy, pp, pp,
+                    self.STATUSES[status_id], chance)
+    
+    def pokemon(self, name: str) -> Pokemon:
+        """A fresh Pokemon (with its own Move objects) built from the species record"""
+        record = self.SPECIES.unpack_from(self.buffer, self.species_offset + self.species_index[name] * self.SPECIES.size)
+        _, _, hp, type_id, move_count = record[:5]
+        moves = [self.move(index) for index in record[5:5 + move_count]]
+        return Pokemon(name, self.types[type_id], hp, {move.name: move for move in moves})
+    
+    def roster(self, names: Optional[List[str]] = None) -> Dict[str, Pokemon]:
+        return {name: self.pokemon(name) for name in (self.species_names if names is None else names)}
+
+@lru_cache(maxsize=None)
+def load_database(path: Optional[str] = None) -> RosterDatabase:
+    """The built-in roster, a compiled .pkdb file (memory-mapped) or a JSON/CSV roster compiled in memory"""
+    if path is None:
+        return RosterDatabase(RosterDatabase.compile(DEFAULT_ROSTER_DATA))
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            if f.read(len(RosterDatabase.MAGIC)) == RosterDatabase.MAGIC:
+                return RosterDatabase.open(path)
+    return RosterDatabase(RosterDatabase.compile(load_roster_data(path)))
+
+def create_pokemon_roster(database: Optional[RosterDatabase] = None) -> Dict[str, Pokemon]:
+    return (load_database() if database is None else database).roster()
 
 def display_health_bar(pokemon: Pokemon) -> str:
     health_percentage = pokemon.current_hp / pokemon.max_hp
@@ -230,16 +775,1253 @@ def get_computer_move(pokemon: Pokemon) -> Move:
     
     return random.choice(available_moves)
 
-def main():
+def computer_turn(battle_system: BattleSystem, pokemon: Pokemon, opponent: Pokemon):
+    """The computer's whole turn: heal when low on HP, then attack if able"""
+    if pokemon.current_hp < pokemon.max_hp * 0.3:
+        # Try to use a healing item
+        for item_name, item in pokemon.items.items():
+            if item.quantity > 0:
+                pokemon.use_item(item_name)
+                break
+    
+    if pokemon.can_move():
+        use_move(battle_system, pokemon, get_computer_move(pokemon), opponent)
+
+def random_turn(battle_system: BattleSystem, pokemon: Pokemon, opponent: Pokemon):
+    """Baseline opponent: a uniformly random move with PP left, never an item"""
+    if pokemon.can_move():
+        available_moves = [move for move in pokemon.moves.values() if move.pp > 0] or list(pokemon.moves.values())
+        use_move(battle_system, pokemon, random.choice(available_moves), opponent)
+
+def use_move(battle_system: BattleSystem, pokemon: Pokemon, move: Move, opponent: Pokemon):
+    emit(EventKind.MOVE_USED, pokemon.name, move.name, side=pokemon.side)
+    damage = battle_system.calculate_damage(move, pokemon, opponent)
+    opponent.current_hp = max(0, opponent.current_hp - damage)
+
+# Whole-turn policies for headless battles, by name
+AI_POLICIES: Dict[str, Callable[[BattleSystem, Pokemon, Pokemon], None]] = {
+    'heuristic': computer_turn,
+    'random': random_turn,
+}
+
+class SearchTimeout(Exception):
+    pass
+
+class ExpectimaxAI:
+    """Search-based opponent choosing the item (if any) and the move for each turn.
+
+    A turn follows computer_turn's rules: optionally use one item, then use a
+    move, for both the AI and the opponent it models.
+
+    Max nodes are the AI's choices and min nodes assume the opponent replies
+    with its best action. Chance nodes cover can_move and, through
+    BattleSystem.damage_distribution, the exact accuracy, critical hit,
+    status and damage roll probabilities of every move. The damage rolls are
+    merged into a knockout outcome plus up to ``damage_bins`` HP bins, so a
+    chance node has a handful of children instead of one per roll.
+
+    A node is the BattleState.sides() of both Pokemon, the side to move and
+    whether the turn ends after this action. Values lie in [-1, 1], which
+    lets max and min nodes use alpha-beta pruning and chance nodes use Star1
+    bounds to stop once the outcomes left cannot change the result. The
+    transposition table is keyed by the node's BattleState snapshot and keeps
+    its bound and best action, which also orders the next, deeper pass.
+    Iterative deepening adds one action (ply) per pass until ``time_budget``
+    seconds are spent, so a bigger budget means a deeper search and a
+    stronger opponent.
+    """
+    STATUS_PENALTY = {StatusEffect.NONE: 0.0, StatusEffect.BURN: 0.1, StatusEffect.POISON: 0.1,
+                      StatusEffect.PARALYZE: 0.05, StatusEffect.FREEZE: 0.15}
+    LOSS, WIN = -1.0, 1.0
+    EXACT, LOWER, UPPER = range(3)
+    
+    def __init__(self, battle_system: Optional[BattleSystem] = None, time_budget: float = 0.5,
+                 max_depth: int = 12, table_size: int = 500000, damage_bins: int = 3):
+        self.battle_system = BattleSystem() if battle_system is None else battle_system
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.damage_bins = damage_bins
+        self.table: Dict[tuple, Tuple[int, float, int, Optional[Tuple[Optional[int], int]]]] = {}
+        self.matchup: Optional[Tuple[Pokemon, Pokemon]] = None
+        self.damage_cache: Dict[tuple, Tuple[float, List[Tuple[float, int, bool]]]] = {}
+        self.last_depth = 0
+        self.nodes = 0
+    
+    def choose(self, pokemon: Pokemon, opponent: Pokemon, moves_second: bool = True) -> Tuple[Optional[str], Move]:
+        """Return (item name or None, Move) for this turn.
+
+        ``moves_second`` says whether the end-of-turn status damage follows
+        this action (the computer moves after the player in main()).
+        """
+        if self.matchup != (pokemon, opponent):
+            self.matchup = (pokemon, opponent)
+            self.sides = (pokemon, opponent)
+            self.moves = (list(pokemon.moves.values()), list(opponent.moves.values()))
+            self.items = (list(pokemon.items.items()), list(opponent.items.items()))
+            self.table.clear()
+            self.damage_cache.clear()
+        elif len(self.table) > self.table_size:
+            self.table.clear()
+        sides = BattleState.capture(pokemon, opponent).sides()
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes = 0
+        best = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best = self._best_action(sides, int(moves_second), depth, timed=depth > 1)
+            except SearchTimeout:
+                break
+            self.last_depth = depth
+        item, move = best
+        return (self.items[0][item][0] if item is not None else None), self.moves[0][move]
+    
+    def _best_action(self, sides: list, second: int, depth: int, timed: bool) -> Tuple[Optional[int], int]:
+        key = (BattleState.from_sides(sides), 0, second)
+        entry = self.table.get(key)
+        best, alpha = None, self.LOSS
+        for action in self._actions(sides, 0, entry[3] if entry else None):
+            value = self._action_value(sides, 0, second, action, depth, alpha, self.WIN, timed)
+            if best is None or value > alpha:
+                best, alpha = action, max(alpha, value)
+        self.table[key] = (depth, alpha, self.LOWER, best)
+        return best
+    
+    def _actions(self, sides: list, mover: int,
+                 first: Optional[Tuple[Optional[int], int]] = None) -> List[Tuple[Optional[int], int]]:
+        """(item index or None, move index) pairs for the side to move, ``first`` first"""
+        hp, status, _, _, pp, quantities = sides[mover]
+        moves = [i for i, left in enumerate(pp) if left > 0] or [0]
+        items = [None]
+        if hp < self.sides[mover].max_hp or status != StatusEffect.NONE:
+            items += [i for i, left in enumerate(quantities) if left > 0]
+        actions = [(item, move) for item in items for move in moves]
+        if first in actions:
+            actions.remove(first)
+            actions.insert(0, first)
+        return actions
+    
+    def _value(self, sides: list, mover: int, second: int, depth: int, alpha: float, beta: float,
+               timed: bool) -> float:
+        """Fail-soft alpha-beta value of a decision node"""
+        me, them = sides[0][0] <= 0, sides[1][0] <= 0
+        if me or them:
+            return 0.0 if me and them else (self.LOSS if me else self.WIN)
+        if depth == 0:
+            return self._evaluate(sides)
+        key = (BattleState.from_sides(sides), mover, second)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            _, value, bound, _ = entry
+            if (bound == self.EXACT or (bound == self.LOWER and value >= beta)
+                    or (bound == self.UPPER and value <= alpha)):
+                return value
+        self.nodes += 1
+        if timed and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        maximizing = mover == 0
+        low, high = alpha, beta
+        best_value, best_action = None, None
+        for action in self._actions(sides, mover, entry[3] if entry else None):
+            value = self._action_value(sides, mover, second, action, depth, low, high, timed)
+            if best_value is None or (value > best_value if maximizing else value < best_value):
+                best_value, best_action = value, action
+            if maximizing:
+                low = max(low, value)
+            else:
+                high = min(high, value)
+            if low >= high:
+                break
+        bound = self.UPPER if best_value <= alpha else self.LOWER if best_value >= beta else self.EXACT
+        self.table[key] = (depth, best_value, bound, best_action)
+        return best_value
+    
+    def _action_value(self, sides: list, mover: int, second: int, action: Tuple[Optional[int], int],
+                      depth: int, alpha: float, beta: float, timed: bool) -> float:
+        """Chance node, searched with Star1 bounds.
+
+        After each outcome the node's value is known to lie between the
+        probability-weighted sum so far plus the remaining probability times
+        LOSS or WIN. Once that range is entirely outside (alpha, beta) the
+        remaining outcomes are skipped and the bound is returned.
+        """
+        total, remaining = 0.0, 1.0
+        for p, outcome in self._outcomes(sides, mover, second, action):
+            remaining -= p
+            low = (alpha - total - remaining * self.WIN) / p
+            high = (beta - total - remaining * self.LOSS) / p
+            value = self._value(outcome, 1 - mover, 1 - second, depth - 1,
+                                max(low, self.LOSS), min(high, self.WIN), timed)
+            total += p * value
+            if value <= low:
+                return total + remaining * self.WIN
+            if value >= high:
+                return total + remaining * self.LOSS
+        return total
+    
+    def _evaluate(self, sides: list) -> float:
+        """Heuristic value in (-1, 1) for the AI: HP share, status and remaining items"""
+        score = 0.0
+        for side, sign in ((0, 1.0), (1, -1.0)):
+            hp, status, _, _, _, quantities = sides[side]
+            score += sign * (0.8 * hp / self.sides[side].max_hp - self.STATUS_PENALTY[status] + 0.02 * sum(quantities))
+        return max(-0.99, min(0.99, score))
+    
+    def _outcomes(self, sides: list, mover: int, second: int,
+                  action: Tuple[Optional[int], int]) -> List[Tuple[float, list]]:
+        """(probability, next sides) for the side to move taking ``action``, likeliest first"""
+        target = sides[1 - mover]
+        hp, status, accuracy, evasion, pp, quantities = sides[mover]
+        item, index = action
+        if item is not None:
+            item_name, held = self.items[mover][item]
+            if item_name == 'Full Restore':
+                hp, status = self.sides[mover].max_hp, StatusEffect.NONE
+            else:
+                hp += min(held.effect_value, self.sides[mover].max_hp - hp)
+            quantities = quantities[:item] + (quantities[item] - 1,) + quantities[item + 1:]
+        actor = (hp, status, accuracy, evasion, pp, quantities)
+        
+        if pp[index] <= 0:  # Nothing left: the move fails without using PP
+            return [(1.0, self._advance(mover, second, actor, target))]
+        blocked = {StatusEffect.FREEZE: 0.8, StatusEffect.PARALYZE: 0.25}.get(status, 0.0)
+        outcomes = [(blocked, self._advance(mover, second, actor, target))] if blocked else []
+        spent = (hp, status, accuracy, evasion, pp[:index] + (pp[index] - 1,) + pp[index + 1:], quantities)
+        move = self.moves[mover][index]
+        target_hp, target_status = target[:2]
+        miss, hits = self._damage_outcomes(mover, index, status, target_status, target_hp)
+        if miss > 0:
+            outcomes.append(((1 - blocked) * miss, self._advance(mover, second, spent, target)))
+        for p, damage, inflicted in hits:
+            new_status = move.status_effect if inflicted else target_status
+            hit_target = (target_hp - damage, new_status) + target[2:]
+            outcomes.append(((1 - blocked) * (1 - miss) * p, self._advance(mover, second, spent, hit_target)))
+        outcomes.sort(key=lambda outcome: -outcome[0])
+        return outcomes
+    
+    def _advance(self, mover: int, second: int, actor: tuple, target: tuple) -> list:
+        """Sides after the mover's action, with end-of-turn status damage after the second action"""
+        sides = [None, None]
+        sides[mover], sides[1 - mover] = actor, target
+        if second and sides[0][0] > 0 and sides[1][0] > 0:
+            for side in (1 - mover, mover):  # The side that moved first takes its status damage first
+                hp, status = sides[side][:2]
+                if status in (StatusEffect.BURN, StatusEffect.POISON):
+                    max_hp = self.sides[side].max_hp
+                    damage = max(1, max_hp // 16) if status == StatusEffect.BURN else max(1, max_hp // 8)
+                    sides[side] = (max(0, hp - damage), status) + sides[side][2:]
+        return sides
+    
+    def _damage_outcomes(self, mover: int, index: int, attacker_status: StatusEffect,
+                         defender_status: StatusEffect, defender_hp: int) -> Tuple[float, List[Tuple[float, int, bool]]]:
+        """Miss chance and (probability, damage, status inflicted) for a hit on a defender at ``defender_hp``.
+
+        Every roll that knocks the defender out is one outcome. The others are
+        split into up to ``damage_bins`` bins of about equal probability, each
+        standing for its probability-weighted mean damage.
+        """
+        key = (mover, index, attacker_status == StatusEffect.BURN, defender_status == StatusEffect.NONE, defender_hp)
+        if key not in self.damage_cache:
+            distribution = self.battle_system.damage_distribution(
+                self.moves[mover][index], self.sides[mover], self.sides[1 - mover], attacker_status, defender_status)
+            knockout = sum(p for damage, p in distribution.hit if damage >= defender_hp)
+            survivable = [(damage, p) for damage, p in distribution.hit if damage < defender_hp]
+            bins, share, weight, total = [], (1 - knockout) / self.damage_bins, 0.0, 0.0
+            for damage, p in survivable:
+                weight += p
+                total += p * damage
+                if weight >= share * (1 - 1e-9) or (damage, p) == survivable[-1]:
+                    bins.append((weight, int(round(total / weight))))
+                    weight = total = 0.0
+            hits = [(knockout, defender_hp, False)] if knockout > 0 else []
+            for p, damage in bins:
+                for inflicted, p_status in ((True, distribution.status), (False, 1 - distribution.status)):
+                    if p_status > 0:
+                        hits.append((p * p_status, damage, inflicted))
+            self.damage_cache[key] = distribution.miss, hits
+        return self.damage_cache[key]
+
+def expectimax_turn(battle_system: BattleSystem, ai: ExpectimaxAI, pokemon: Pokemon, opponent: Pokemon,
+                    moves_second: bool = True):
+    """computer_turn with the item and move chosen by the search AI"""
+    item_name, move = ai.choose(pokemon, opponent, moves_second)
+    if item_name is not None:
+        pokemon.use_item(item_name)
+    if pokemon.can_move():
+        use_move(battle_system, pokemon, move, opponent)
+
+class Team:
+    """Up to six Pokemon, one of which is active at a time"""
+    MAX_SIZE = 6
+    
+    def __init__(self, members: List[Pokemon]):
+        if not 1 <= len(members) <= self.MAX_SIZE:
+            raise ValueError(f"A team has between 1 and {self.MAX_SIZE} Pokemon, not {len(members)}")
+        self.members = members
+        self.active = 0
+    
+    @property
+    def current(self) -> Pokemon:
+        return self.members[self.active]
+    
+    def switch_options(self) -> List[int]:
+        return [i for i, pokemon in enumerate(self.members) if i != self.active and not pokemon.is_fainted()]
+    
+    def defeated(self) -> bool:
+        return all(pokemon.is_fainted() for pokemon in self.members)
+    
+    def to_json(self) -> dict:
+        return {
+            'active': self.active,
+            'members': [{
+                'name': pokemon.name,
+                'hp': pokemon.current_hp,
+                'max_hp': pokemon.max_hp,
+                'status': pokemon.status.value,
+                'pp': {move.name: move.pp for move in pokemon.moves.values()},
+                'items': {item.name: item.quantity for item in pokemon.items.values()},
+            } for pokemon in self.members],
+        }
+
+def random_team(database: RosterDatabase, size: int = Team.MAX_SIZE) -> Team:
+    """A team of ``size`` species drawn from the roster (repeats allowed for small rosters)"""
+    return Team([database.pokemon(random.choice(database.species_names)) for _ in range(size)])
+
+class TeamBattle:
+    """A battle between two teams, advanced one turn at a time by play_turn().
+    
+    Actions are JSON-friendly dicts: {'move': name}, {'item': name} or
+    {'switch': index}. Each turn both sides act: switches happen first, then
+    items, then the moves in random order. When an active Pokemon faints its
+    side must send in a replacement, and play_turn() then only accepts that
+    switch (the other side passes None). A side wins once every Pokemon of
+    the other team has fainted; reaching max_turns is a draw.
+    """
+    
+    def __init__(self, teams: Tuple[Team, Team], battle_system: BattleSystem, max_turns: int = 500):
+        self.teams = teams
+        for side, team in enumerate(teams):
+            for pokemon in team.members:
+                pokemon.side = side
+        self.battle_system = battle_system
+        self.max_turns = max_turns
+        self.turn = 0
+        self.needs_switch = [False, False]
+        self.finished = False
+        self.winner: Optional[int] = None  # Side index, or None for a draw
+    
+    def legal_actions(self, side: int) -> List[dict]:
+        """What ``side`` may do now; empty while it waits for the other side"""
+        team = self.teams[side]
+        if self.finished:
+            return []
+        if self.needs_switch[side]:
+            return [{'switch': i} for i in team.switch_options()]
+        if any(self.needs_switch):
+            return []
+        moves = team.current.moves.values()
+        actions = [{'move': move.name} for move in moves if move.pp > 0]
+        if not actions:  # Out of PP everywhere: any move may be attempted
+            actions = [{'move': move.name} for move in moves]
+        actions += [{'item': item.name} for item in team.current.items.values() if item.quantity > 0]
+        actions += [{'switch': i} for i in team.switch_options()]
+        return actions
+    
+    def play_turn(self, actions: List[Optional[dict]]):
+        """Resolve one action per side; raises ValueError for an illegal action"""
+        if self.finished:
+            raise ValueError("The battle is over")
+        for side in (0, 1):
+            legal = self.legal_actions(side)
+            if legal and actions[side] not in legal:
+                raise ValueError(f"Illegal action for side {side}: {actions[side]!r}")
+        
+        if any(self.needs_switch):
+            for side in (0, 1):
+                if self.needs_switch[side]:
+                    self._switch(side, actions[side]['switch'])
+                    self.needs_switch[side] = False
+            return
+        
+        for side in (0, 1):
+            if 'switch' in actions[side]:
+                self._switch(side, actions[side]['switch'])
+        for side in (0, 1):
+            if 'item' in actions[side]:
+                self.teams[side].current.use_item(actions[side]['item'])
+        order = [0, 1] if random.random() < 0.5 else [1, 0]
+        for side in order:
+            if 'move' not in actions[side]:
+                continue
+            attacker, defender = self.teams[side].current, self.teams[1 - side].current
+            if attacker.is_fainted() or defender.is_fainted():
+                continue
+            if attacker.can_move():
+                use_move(self.battle_system, attacker, attacker.moves[actions[side]['move']], defender)
+        for team in self.teams:
+            if not team.current.is_fainted():
+                team.current.apply_status_effects()
+        
+        self.turn += 1
+        for side, team in enumerate(self.teams):
+            if team.current.is_fainted():
+                emit(EventKind.FAINTED, team.current.name, side=side)
+                self.needs_switch[side] = not team.defeated()
+        defeated = [team.defeated() for team in self.teams]
+        if any(defeated):
+            self._finish(None if all(defeated) else defeated.index(False))
+        elif self.turn >= self.max_turns:
+            self._finish(None)
+    
+    def _switch(self, side: int, index: int):
+        team = self.teams[side]
+        previous = team.current
+        team.active = index
+        emit(EventKind.SWITCHED, team.current.name, previous.name, side=side)
+    
+    def _finish(self, winner: Optional[int]):
+        self.finished = True
+        self.winner = winner
+        self.needs_switch = [False, False]
+    
+    def to_json(self) -> dict:
+        return {
+            'turn': self.turn,
+            'finished': self.finished,
+            'winner': self.winner,
+            'needs_switch': self.needs_switch,
+            'teams': [team.to_json() for team in self.teams],
+        }
+
+def team_ai_action(battle: TeamBattle, side: int) -> Optional[dict]:
+    """The computer's action in a team battle, following computer_turn's habits"""
+    legal = battle.legal_actions(side)
+    if not legal:
+        return None
+    team = battle.teams[side]
+    if battle.needs_switch[side]:
+        return max(legal, key=lambda action: team.members[action['switch']].current_hp)
+    pokemon = team.current
+    if pokemon.current_hp < pokemon.max_hp * 0.3:
+        items = [action for action in legal if 'item' in action]
+        if items:
+            return items[0]
+    return {'move': get_computer_move(pokemon).name}
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score confidence interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+@dataclass
+class SimulationResult:
+    names: List[str]
+    wins: List[List[int]]     # wins[i][j]: battles species i won against species j
+    battles: List[List[int]]  # battles[i][j]: battles played between i and j
+    seconds: float = 0.0
+    
+    def win_probability(self, i: int, j: int) -> float:
+        return self.wins[i][j] / self.battles[i][j] if self.battles[i][j] else 0.0
+    
+    def confidence_interval(self, i: int, j: int, z: float = 1.96) -> Tuple[float, float]:
+        return wilson_interval(self.wins[i][j], self.battles[i][j], z)
+    
+    def total_battles(self) -> int:
+        """Battles actually played (each off-diagonal battle appears in two cells)"""
+        n = len(self.names)
+        return sum(self.battles[i][j] for i in range(n) for j in range(i, n))
+    
+    def battles_per_second(self) -> float:
+        return self.total_battles() / self.seconds if self.seconds > 0 else 0.0
+    
+    def format_table(self) -> str:
+        """Win probability of each row against each column, with 95% intervals"""
+        width = 22
+        lines = [" " * 12 + "".join(f"{name:>{width}}" for name in self.names)]
+        for i, name in enumerate(self.names):
+            cells = []
+            for j in range(len(self.names)):
+                low, high = self.confidence_interval(i, j)
+                cells.append(f"{self.win_probability(i, j):.3f} [{low:.3f}-{high:.3f}]".rjust(width))
+            lines.append(f"{name:<12}" + "".join(cells))
+        return "\n".join(lines)
+
+class VectorizedBattleEngine:
+    """Many computer-vs-computer battles at once, packed into NumPy arrays.
+
+    A struct-of-arrays port of BattleSimulator.run_battle. Each battle is a
+    column, the two sides are axis 0, and PP and item counts add a trailing
+    axis. Species data is compiled once into flat tables, including a dense
+    type effectiveness matrix built from BattleSystem.type_effectiveness.
+    Move and item availability are kept as per-battle bitmasks, so "choose
+    among the usable moves" becomes a table lookup instead of a reduction.
+    Every half-turn draws its random numbers for the whole batch in one call,
+    then applies computer_turn and calculate_damage rule by rule. The outcome
+    distribution therefore matches the scalar engine even though the random
+    streams differ. Finished battles are dropped after every turn.
+    """
+    NONE, BURN, FREEZE, PARALYZE, POISON = range(5)
+    STATUS_CODES = {StatusEffect.NONE: NONE, StatusEffect.BURN: BURN, StatusEffect.FREEZE: FREEZE,
+                    StatusEffect.PARALYZE: PARALYZE, StatusEffect.POISON: POISON}
+    SLOTS = 8  # Moves and items per Pokemon must fit in a uint8 bitmask
+    
+    def __init__(self, roster: Optional[Dict[str, Pokemon]] = None,
+                 battle_system: Optional[BattleSystem] = None, max_turns: int = 200):
+        if np is None:
+            raise RuntimeError("The vectorized battle engine needs the 'numpy' package")
+        roster = create_pokemon_roster() if roster is None else roster
+        battle_system = BattleSystem() if battle_system is None else battle_system
+        self.max_turns = max_turns
+        self.names = list(roster)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        
+        types = list(PokemonType)
+        type_ids = {t: i for i, t in enumerate(types)}
+        self.n_types = len(types)
+        self.normal = type_ids[PokemonType.NORMAL]
+        type_matrix = np.ones((len(types), len(types)))
+        for move_type, row in battle_system.type_effectiveness.items():
+            for defender_type, effectiveness in row.items():
+                type_matrix[type_ids[move_type], type_ids[defender_type]] = effectiveness
+        self.type_matrix = type_matrix.ravel()
+        
+        pokemon = list(roster.values())
+        self.n_moves = max(len(p.moves) for p in pokemon)
+        self.n_items = max(len(p.items) for p in pokemon)
+        if max(self.n_moves, self.n_items) > self.SLOTS:
+            raise ValueError(f"At most {self.SLOTS} moves and {self.SLOTS} items per Pokemon are supported")
+        
+        # Per-species tables; move and item tables are flat [species * slots + slot]
+        moves = (len(pokemon), self.n_moves)
+        held = (len(pokemon), self.n_items)
+        self.hp = np.array([p.max_hp for p in pokemon], dtype=np.int64)
+        self.type = np.array([type_ids[p.type1] for p in pokemon])
+        self.power = np.zeros(moves)
+        self.accuracy = np.zeros(moves, dtype=np.int64)
+        self.max_pp = np.zeros(moves, dtype=np.int64)
+        self.move_type = np.full(moves, self.normal)
+        self.effect = np.zeros(moves, dtype=np.int8)
+        self.chance = np.zeros(moves)
+        self.item_value = np.zeros(held, dtype=np.int64)
+        self.item_restore = np.zeros(held, dtype=bool)
+        self.item_quantity = np.zeros(held, dtype=np.int64)
+        self.move_bits = np.zeros(len(pokemon), dtype=np.uint8)
+        self.status_bits = np.zeros(len(pokemon), dtype=np.uint8)
+        self.powerful_bits = np.zeros(len(pokemon), dtype=np.uint8)
+        for s, p in enumerate(pokemon):
+            for m, move in enumerate(p.moves.values()):
+                self.power[s, m] = move.power
+                self.accuracy[s, m] = move.accuracy
+                self.max_pp[s, m] = move.max_pp
+                self.move_type[s, m] = type_ids[move.type]
+                self.effect[s, m] = self.STATUS_CODES[move.status_effect or StatusEffect.NONE]
+                self.chance[s, m] = move.status_chance
+                self.move_bits[s] |= 1 << m
+                if move.status_effect:
+                    self.status_bits[s] |= 1 << m
+                if move.power >= 40:
+                    self.powerful_bits[s] |= 1 << m
+            for k, (item_name, item) in enumerate(p.items.items()):
+                self.item_value[s, k] = item.effect_value
+                self.item_restore[s, k] = item_name == 'Full Restore'
+                self.item_quantity[s, k] = item.max_quantity
+        for table in ('power', 'accuracy', 'move_type', 'effect', 'chance', 'item_value', 'item_restore'):
+            setattr(self, table, getattr(self, table).ravel())
+        
+        # Bitmask helpers: set-bit counts and the position of the k-th set bit
+        masks = range(1 << self.SLOTS)
+        self.bit = (1 << np.arange(self.SLOTS)).astype(np.uint8)
+        self.bit_count = np.array([bin(mask).count('1') for mask in masks], dtype=np.int64)
+        self.nth_bit = np.zeros((1 << self.SLOTS) * self.SLOTS, dtype=np.int64)
+        for mask in masks:
+            positions = [b for b in range(self.SLOTS) if mask >> b & 1]
+            self.nth_bit[mask * self.SLOTS:mask * self.SLOTS + len(positions)] = positions
+    
+    def run(self, species_a, species_b, rng) -> "np.ndarray":
+        """Fight species_a[k] against species_b[k] for every k.
+
+        Returns 0 where side a won, 1 where side b won and -1 for a draw.
+        """
+        species_a = np.asarray(species_a)
+        species_b = np.asarray(species_b)
+        outcome = np.full(len(species_a), -1, dtype=np.int8)
+        
+        # Slot 0 always moves first, so swap the sides of half the battles
+        swapped = rng.random(len(species_a)) < 0.5
+        species = np.where(swapped, [species_b, species_a], [species_a, species_b])
+        battles = np.arange(len(species_a))
+        state = {
+            'species': species,
+            'max_hp': self.hp[species],
+            'hp': self.hp[species],
+            'status': np.full(species.shape, self.NONE, dtype=np.int8),
+            'pp': self.max_pp[species],
+            'usable': self.move_bits[species],
+            'items': self.item_quantity[species],
+            'stocked': np.zeros(species.shape, dtype=np.uint8),
+        }
+        for k in range(self.n_items):
+            state['stocked'] |= np.where(state['items'][..., k] > 0, self.bit[k], 0).astype(np.uint8)
+        
+        for _ in range(self.max_turns):
+            if not battles.size:
+                break
+            hp, max_hp, status = state['hp'], state['max_hp'], state['status']
+            live = np.ones(battles.size, dtype=bool)
+            for attacker in (0, 1):
+                self._half_turn(attacker, state, live, rng)
+                fainted = live & (hp[1 - attacker] <= 0)
+                outcome[battles[fainted]] = attacker
+                live &= ~fainted
+            
+            # Apply status effects at end of turn
+            burned = live & (status == self.BURN)
+            poisoned = live & (status == self.POISON)
+            hp[burned] = np.maximum(0, hp[burned] - np.maximum(1, max_hp[burned] // 16))
+            hp[poisoned] = np.maximum(0, hp[poisoned] - np.maximum(1, max_hp[poisoned] // 8))
+            fainted = hp <= 0
+            outcome[battles[live & fainted[1] & ~fainted[0]]] = 0
+            outcome[battles[live & fainted[0] & ~fainted[1]]] = 1
+            live &= ~(fainted[0] | fainted[1])
+            
+            battles = battles[live]
+            for key, value in state.items():
+                state[key] = value.compress(live, axis=1)  # Stays C-contiguous for the flat views
+        
+        # Map the first/second-mover slots back to sides a and b
+        return np.where((outcome >= 0) & swapped, 1 - outcome, outcome).astype(np.int8)
+    
+    def _half_turn(self, a: int, state: Dict[str, "np.ndarray"], live: "np.ndarray", rng):
+        """computer_turn for slot ``a`` in every live battle, updating ``state`` in place"""
+        d = 1 - a
+        own, other = state['species'][a], state['species'][d]
+        hp, max_hp, status = state['hp'], state['max_hp'], state['status']
+        usable, stocked = state['usable'][a], state['stocked'][a]
+        pp, items = state['pp'][a].reshape(-1), state['items'][a].reshape(-1)
+        rows = np.arange(live.size)
+        draws = rng.random((6, live.size))
+        
+        # Heal with the first item still in stock when below 30% HP
+        slot = self.nth_bit.take(stocked.astype(np.int64) * self.SLOTS)
+        heal = live & (hp[a] < max_hp[a] * 0.3) & (stocked != 0)
+        held = own * self.n_items + slot
+        restore = heal & self.item_restore.take(held)
+        healed = hp[a] + np.minimum(self.item_value.take(held), max_hp[a] - hp[a])
+        hp[a] = np.where(restore, max_hp[a], np.where(heal, healed, hp[a]))
+        status[a][restore] = self.NONE
+        held = rows * self.n_items + slot
+        items[held[heal]] -= 1
+        stocked ^= np.where(heal & (items.take(held) == 0), self.bit.take(slot), 0).astype(np.uint8)
+        
+        # can_move
+        frozen = (status[a] == self.FREEZE) & (draws[0] < 0.8)
+        paralyzed = (status[a] == self.PARALYZE) & (draws[0] < 0.25)
+        moving = live & ~(frozen | paralyzed)
+        
+        # get_computer_move: narrow the candidate bitmask, then pick one bit uniformly
+        candidates = np.where(usable != 0, usable, self.move_bits.take(own))
+        status_moves = usable & self.status_bits.take(own)
+        candidates = np.where((hp[a] > max_hp[a] * 0.7) & (status_moves != 0), status_moves, candidates)
+        powerful = usable & self.powerful_bits.take(own)
+        candidates = np.where((hp[a] < max_hp[a] * 0.3) & (powerful != 0), powerful, candidates)
+        candidates = candidates.astype(np.int64)
+        pick = (draws[1] * self.bit_count.take(candidates)).astype(np.int64)
+        move = self.nth_bit.take(candidates * self.SLOTS + pick)
+        
+        # calculate_damage
+        known = own * self.n_moves + move
+        accuracy = self.accuracy.take(known)
+        hit = (accuracy == 100) | (draws[2] < accuracy / 100)
+        spend = moving & ((usable & self.bit.take(move)) != 0)
+        slots = rows * self.n_moves + move
+        pp[slots[spend]] -= 1
+        usable ^= np.where(spend & (pp.take(slots) == 0), self.bit.take(move), 0).astype(np.uint8)
+        landed = spend & hit
+        
+        move_type = self.move_type.take(known)
+        damage = self.power.take(known) * self.type_matrix.take(move_type * self.n_types + self.type.take(other))
+        damage *= np.where(draws[3] < 0.0625, 1.5, 1.0)
+        effect = self.effect.take(known)
+        inflict = landed & (effect != self.NONE) & (draws[4] < self.chance.take(known)) & (status[d] == self.NONE)
+        status[d][inflict] = effect[inflict]
+        damage *= np.where(move_type == self.type.take(own), 1.5, 1.0)
+        damage *= np.where((status[a] == self.BURN) & (move_type != self.normal), 0.5, 1.0)
+        damage = (damage * (0.85 + (1.0 - 0.85) * draws[5])).astype(np.int64)
+        hp[d] = np.where(landed, np.maximum(0, hp[d] - damage), hp[d])
+    
+    def run_matchup(self, name_a: str, name_b: str, battles: int, rng) -> Tuple[int, int]:
+        """Wins for a and wins for b over ``battles`` battles of a against b"""
+        outcome = self.run(np.full(battles, self.index[name_a]), np.full(battles, self.index[name_b]), rng)
+        return int(np.count_nonzero(outcome == 0)), int(np.count_nonzero(outcome == 1))
+
+class BattleSimulator:
+    """Headless AI-vs-AI battles over every pair of species in the roster.
+
+    Both sides play computer_turn, i.e. the interactive game's own healing,
+    get_computer_move, calculate_damage and status rules. The first mover is
+    drawn at random each battle and battles still running after ``max_turns``
+    count as draws.
+    
+    Each pairing is split into shards of ``shard_size`` battles, and every
+    shard seeds the random module from (seed, pairing, shard index). Shards
+    can therefore run in any order on any number of worker processes and the
+    merged counts are the same for a given seed.
+    
+    With ``vectorized`` set, each shard is played as one batch on the
+    VectorizedBattleEngine instead, which pays off for shards of tens of
+    thousands of battles.
+    
+    Both sides start each battle from a BattleState snapshot of the fresh
+    roster. Battle events go to ``event_sink`` (discarded by default). A log sink
+    such as BinaryEventLog needs the scalar engine and a single process.
+    
+    ``roster`` is a path for load_database (the built-in roster by default);
+    worker processes reopen it by path.
+    """
+    def __init__(self, seed: int = 0, max_turns: int = 200, shard_size: int = 1000, vectorized: bool = False,
+                 event_sink=None, roster: Optional[str] = None):
+        self.seed = seed
+        self.max_turns = max_turns
+        self.shard_size = shard_size
+        self.vectorized = vectorized
+        self.event_sink = NullSink() if event_sink is None else event_sink
+        self.roster = roster
+        database = load_database(roster)
+        self.battle_system = BattleSystem(database)
+        self.rosters = (database.roster(), database.roster())
+        self.fresh = {name: BattleState.capture(p) for name, p in self.rosters[0].items()}
+        self.engine = VectorizedBattleEngine(self.rosters[0], self.battle_system, max_turns) if vectorized else None
+    
+    def run_battle(self, first: Pokemon, second: Pokemon,
+                   policies: Tuple[Callable, Callable] = (computer_turn, computer_turn)) -> Optional[Pokemon]:
+        """Fight one battle from full health and return the winner, or None for a draw.
+
+        ``policies`` are the turn functions (see AI_POLICIES) of first and second.
+        """
+        self.fresh[first.name].restore(first)
+        self.fresh[second.name].restore(second)
+        first.side, second.side = 0, 1
+        if random.random() < 0.5:
+            first, second = second, first
+            policies = policies[::-1]
+        emit(EventKind.BATTLE_START, first.name, second.name, side=first.side)
+        winner = self._fight(first, second, policies)
+        emit(EventKind.BATTLE_END, winner.name if winner else "", side=winner.side if winner else 0)
+        return winner
+    
+    def _fight(self, first: Pokemon, second: Pokemon, policies: Tuple[Callable, Callable]) -> Optional[Pokemon]:
+        first_turn, second_turn = policies
+        for _ in range(self.max_turns):
+            first_turn(self.battle_system, first, second)
+            if second.is_fainted():
+                return first
+            second_turn(self.battle_system, second, first)
+            if first.is_fainted():
+                return second
+            
+            # Apply status effects at end of turn
+            first.apply_status_effects()
+            second.apply_status_effects()
+            if first.is_fainted() or second.is_fainted():
+                if first.is_fainted() and second.is_fainted():
+                    return None
+                return second if first.is_fainted() else first
+        return None
+    
+    def shards(self, battles: int, names: List[str]) -> List[Tuple[str, str, int, int]]:
+        """(name_a, name_b, shard index, battles) for every pairing, mirror matches included"""
+        tasks = []
+        for i, name_a in enumerate(names):
+            for name_b in names[i:]:
+                for shard, start in enumerate(range(0, battles, self.shard_size)):
+                    tasks.append((name_a, name_b, shard, min(self.shard_size, battles - start)))
+        return tasks
+    
+    def run_shard(self, name_a: str, name_b: str, shard: int, battles: int) -> Tuple[str, str, int, int, int]:
+        """Play one shard and return (name_a, name_b, wins for a, wins for b, battles)"""
+        if self.engine is not None:
+            index = self.engine.index
+            rng = np.random.default_rng([self.seed, index[name_a], index[name_b], shard])
+            return (name_a, name_b) + self.engine.run_matchup(name_a, name_b, battles, rng) + (battles,)
+        wins_a, wins_b = self._play(name_a, name_b, (computer_turn, computer_turn), battles,
+                                    f"{self.seed}:{name_a}:{name_b}:{shard}")
+        return name_a, name_b, wins_a, wins_b, battles
+    
+    def run_matchup(self, name_a: str, policy_a: str, name_b: str, policy_b: str,
+                    battles: int) -> Tuple[str, str, str, str, int, int, int]:
+        """Play two (species, policy) entrants against each other.
+
+        Returns (name_a, policy_a, name_b, policy_b, wins for a, wins for b, draws).
+        """
+        policies = (AI_POLICIES[policy_a], AI_POLICIES[policy_b])
+        wins_a, wins_b = self._play(name_a, name_b, policies, battles,
+                                    f"{self.seed}:{name_a}:{policy_a}:{name_b}:{policy_b}")
+        return name_a, policy_a, name_b, policy_b, wins_a, wins_b, battles - wins_a - wins_b
+    
+    def _play(self, name_a: str, name_b: str, policies: Tuple[Callable, Callable], battles: int,
+              seed: str) -> Tuple[int, int]:
+        """Wins for a and b over ``battles`` battles, with the random module seeded from ``seed``"""
+        a, b = self.rosters[0][name_a], self.rosters[1][name_b]
+        wins_a = wins_b = 0
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            with routed_to(self.event_sink):
+                for _ in range(battles):
+                    winner = self.run_battle(a, b, policies)
+                    if winner is a:
+                        wins_a += 1
+                    elif winner is b:
+                        wins_b += 1
+        finally:
+            random.setstate(state)
+        return wins_a, wins_b
+    
+    def run(self, battles: int, names: Optional[List[str]] = None, workers: int = 1) -> SimulationResult:
+        """Play ``battles`` battles per pairing, over a process pool when workers > 1.
+
+        Shard results are merged into the counters as they complete, so memory
+        use does not grow with the number of battles.
+        """
+        names = list(self.rosters[0]) if names is None else names
+        index = {name: i for i, name in enumerate(names)}
+        n = len(names)
+        result = SimulationResult(names, [[0] * n for _ in range(n)], [[0] * n for _ in range(n)])
+        
+        def merge(shard_result: Tuple[str, str, int, int, int]):
+            name_a, name_b, wins_a, wins_b, played = shard_result
+            i, j = index[name_a], index[name_b]
+            result.wins[i][j] += wins_a
+            result.battles[i][j] += played
+            if i != j:  # A mirror match is scored from a's side only
+                result.wins[j][i] += wins_b
+                result.battles[j][i] += played
+        
+        if self.event_sink.active and (workers > 1 or self.engine is not None):
+            raise ValueError("Battle events can only be recorded by the scalar engine in a single process")
+        tasks = self.shards(battles, names)
+        started = time.perf_counter()
+        if workers <= 1:
+            for task in tasks:
+                merge(self.run_shard(*task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(simulate_shard, self.seed, self.max_turns, self.shard_size,
+                                           self.vectorized, self.roster, *task) for task in tasks]
+                for future in as_completed(futures):
+                    merge(future.result())
+        result.seconds = time.perf_counter() - started
+        return result
+
+_worker_simulators: Dict[Tuple[int, int, int, bool, Optional[str]], BattleSimulator] = {}
+
+def simulate_shard(seed: int, max_turns: int, shard_size: int, vectorized: bool, roster: Optional[str],
+                   name_a: str, name_b: str, shard: int, battles: int) -> Tuple[str, str, int, int, int]:
+    """Process-pool task: run one shard on a simulator reused within the worker"""
+    key = (seed, max_turns, shard_size, vectorized, roster)
+    if key not in _worker_simulators:
+        _worker_simulators[key] = BattleSimulator(seed, max_turns, shard_size, vectorized, roster=roster)
+    return _worker_simulators[key].run_shard(name_a, name_b, shard, battles)
+
+def tournament_matchup(seed: int, max_turns: int, roster: Optional[str], name_a: str, policy_a: str,
+                       name_b: str, policy_b: str, battles: int) -> Tuple[str, str, str, str, int, int, int]:
+    """Process-pool task: play one tournament matchup on a simulator reused within the worker"""
+    key = (seed, max_turns, 1000, False, roster)
+    if key not in _worker_simulators:
+        _worker_simulators[key] = BattleSimulator(seed, max_turns, roster=roster)
+    return _worker_simulators[key].run_matchup(name_a, policy_a, name_b, policy_b, battles)
+
+class Tournament:
+    """Round-robin between every (species, AI policy) entrant, stored in SQLite.
+    
+    Each matchup plays ``battles`` battles and is appended to the ``matchups``
+    table in its own transaction as soon as it finishes. Rows are keyed by
+    the entrants and the settings (seed, battles, max_turns), so running the
+    same tournament again skips everything already recorded and resumes an
+    interrupted one where it stopped. Matchups are seeded individually, so a
+    resumed tournament stores the same results as an uninterrupted one.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS matchups (
+            species_a TEXT NOT NULL, policy_a TEXT NOT NULL,
+            species_b TEXT NOT NULL, policy_b TEXT NOT NULL,
+            seed INTEGER NOT NULL, battles INTEGER NOT NULL, max_turns INTEGER NOT NULL,
+            wins_a INTEGER NOT NULL, wins_b INTEGER NOT NULL, draws INTEGER NOT NULL,
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (species_a, policy_a, species_b, policy_b, seed, battles, max_turns)
+        )
+    """
+    
+    def __init__(self, path: str, battles: int = 100, seed: int = 0, policies: Optional[List[str]] = None,
+                 roster: Optional[str] = None, max_turns: int = 200):
+        policies = list(AI_POLICIES) if policies is None else policies
+        for policy in policies:
+            if policy not in AI_POLICIES:
+                raise ValueError(f"Unknown AI policy {policy!r} (choose from {', '.join(AI_POLICIES)})")
+        self.path = path
+        self.battles = battles
+        self.seed = seed
+        self.roster = roster
+        self.max_turns = max_turns
+        names = load_database(roster).species_names
+        self.entrants = [(name, policy) for name in names for policy in policies]
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(self.SCHEMA)
+    
+    def matchups(self) -> List[Tuple[str, str, str, str]]:
+        """(species_a, policy_a, species_b, policy_b) for every pair of distinct entrants"""
+        return [a + b for i, a in enumerate(self.entrants) for b in self.entrants[i + 1:]]
+    
+    def completed(self) -> set:
+        rows = self.connection.execute(
+            "SELECT species_a, policy_a, species_b, policy_b FROM matchups "
+            "WHERE seed = ? AND battles = ? AND max_turns = ?", (self.seed, self.battles, self.max_turns))
+        return set(rows)
+    
+    def record(self, result: Tuple[str, str, str, str, int, int, int]):
+        name_a, policy_a, name_b, policy_b, wins_a, wins_b, draws = result
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO matchups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name_a, policy_a, name_b, policy_b, self.seed, self.battles, self.max_turns,
+                 wins_a, wins_b, draws, time.time()))
+    
+    def run(self, workers: int = 1, progress=None) -> Tuple[int, int]:
+        """Play every matchup not yet recorded; returns (played, skipped).
+        
+        ``progress`` is called with (done, total) after each recorded matchup.
+        """
+        done = self.completed()
+        pending = [matchup for matchup in self.matchups() if matchup not in done]
+        total = len(pending)
+        
+        def finished(result, count: int):
+            self.record(result)
+            if progress is not None:
+                progress(count, total)
+        
+        if workers <= 1:
+            simulator = BattleSimulator(self.seed, self.max_turns, roster=self.roster)
+            for count, matchup in enumerate(pending, 1):
+                finished(simulator.run_matchup(*matchup, self.battles), count)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(tournament_matchup, self.seed, self.max_turns, self.roster,
+                                           *matchup, self.battles) for matchup in pending]
+                for count, future in enumerate(as_completed(futures), 1):
+                    finished(future.result(), count)
+        return total, len(self.matchups()) - total
+    
+    def ratings(self, iterations: int = 500) -> List[Tuple[str, str, float, int, int, int]]:
+        """(species, policy, Elo, wins, draws, losses) for each entrant, best first.
+        
+        Ratings are the maximum-likelihood Bradley-Terry strengths on the Elo
+        scale (400 points for 10:1 odds, mean 1500), fitted to every recorded
+        battle at once, so they do not depend on the order matchups were
+        played in. Draws count half a win each way, and each matchup gets one
+        extra virtual draw so unbeaten or winless entrants stay finite.
+        """
+        index = {entrant: i for i, entrant in enumerate(self.entrants)}
+        n = len(self.entrants)
+        score = [0.0] * n
+        games: Dict[Tuple[int, int], float] = {}
+        record = [[0, 0, 0] for _ in range(n)]
+        rows = self.connection.execute(
+            "SELECT species_a, policy_a, species_b, policy_b, wins_a, wins_b, draws FROM matchups "
+            "WHERE seed = ? AND battles = ? AND max_turns = ?", (self.seed, self.battles, self.max_turns))
+        for name_a, policy_a, name_b, policy_b, wins_a, wins_b, draws in rows:
+            if (name_a, policy_a) not in index or (name_b, policy_b) not in index:
+                continue
+            i, j = index[name_a, policy_a], index[name_b, policy_b]
+            score[i] += wins_a + (draws + 1) / 2
+            score[j] += wins_b + (draws + 1) / 2
+            games[i, j] = wins_a + wins_b + draws + 1
+            record[i][0] += wins_a
+            record[i][1] += draws
+            record[i][2] += wins_b
+            record[j][0] += wins_b
+            record[j][1] += draws
+            record[j][2] += wins_a
+        
+        strength = [1.0] * n
+        for _ in range(iterations):
+            denominator = [0.0] * n
+            for (i, j), count in games.items():
+                share = count / (strength[i] + strength[j])
+                denominator[i] += share
+                denominator[j] += share
+            updated = [score[i] / denominator[i] if denominator[i] else 1.0 for i in range(n)]
+            scale = math.exp(sum(math.log(s) for s in updated) / n)
+            updated = [s / scale for s in updated]
+            converged = max(abs(u - s) / s for u, s in zip(updated, strength)) < 1e-10
+            strength = updated
+            if converged:
+                break
+        
+        table = [(name, policy, 1500 + 400 * math.log10(strength[i]), *record[i])
+                 for i, (name, policy) in enumerate(self.entrants)]
+        return sorted(table, key=lambda row: -row[2])
+    
+    def format_ratings(self) -> str:
+        lines = [f"{'Rank':<6}{'Species':<14}{'Policy':<12}{'Elo':>8}{'W':>8}{'D':>7}{'L':>8}{'Score':>8}"]
+        for rank, (name, policy, elo, wins, draws, losses) in enumerate(self.ratings(), 1):
+            played = wins + draws + losses
+            share = (wins + draws / 2) / played if played else 0.0
+            lines.append(f"{rank:<6}{name:<14}{policy:<12}{elo:>8.0f}{wins:>8}{draws:>7}{losses:>8}{share:>8.3f}")
+        return "\n".join(lines)
+    
+    def close(self):
+        self.connection.close()
+
+class EventRecorder(NullSink):
+    """Keeps events in a list"""
+    active = True
+    
+    def __init__(self):
+        self.events: List[Event] = []
+    
+    def write(self, event: Event):
+        self.events.append(event)
+
+class BattleServer:
+    """Hosts many team battles at once over a JSON-lines socket protocol.
+    
+    Every request is one JSON object per line and gets exactly one response
+    line echoing its "id". Operations:
+    
+      {"op": "new", "team_size": 6}  or  {"op": "new", "teams": [[names], [names]]}
+          -> {"battle": id, "actions": [...], "finished": false}
+      {"op": "act", "battle": id, "action": {"move": "Surf"}}
+          -> {"battle": id, "turn": n, "events": [[kind, side, subject, detail, value], ...],
+              "actions": [...], "finished": bool, "winner": side or null}
+      {"op": "state", "battle": id}  -> {"battle": id, "state": {...}}
+      {"op": "close", "battle": id}  -> {"battle": id, "closed": true}
+    
+    The client plays side 0 and the server's team AI plays side 1. Failures
+    come back as {"error": message} with the request's "id" (null if the
+    line was not a JSON object). Battles are plain TeamBattle objects
+    advanced inside the event loop, so thousands of them cost only memory.
+    """
+    
+    def __init__(self, database: Optional[RosterDatabase] = None, max_turns: int = 500):
+        self.database = load_database() if database is None else database
+        self.battle_system = BattleSystem(self.database)
+        self.max_turns = max_turns
+        self.battles: Dict[int, TeamBattle] = {}
+        self.next_id = 1
+    
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object")
+                    request_id = request.get('id')
+                    response = self.dispatch(request)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {'error': str(e) or type(e).__name__}
+                response['id'] = request_id
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    def dispatch(self, request: dict) -> dict:
+        op = request.get('op')
+        if op == 'new':
+            return self.new_battle(request.get('teams'), request.get('team_size', Team.MAX_SIZE))
+        battle_id = request['battle']
+        if battle_id not in self.battles:
+            raise ValueError(f"No battle {battle_id}")
+        battle = self.battles[battle_id]
+        if op == 'act':
+            return self.act(battle_id, battle, request['action'])
+        if op == 'state':
+            return {'battle': battle_id, 'state': battle.to_json()}
+        if op == 'close':
+            del self.battles[battle_id]
+            return {'battle': battle_id, 'closed': True}
+        raise ValueError(f"Unknown op {op!r}")
+    
+    def new_battle(self, teams: Optional[List[List[str]]], team_size: int) -> dict:
+        if teams is None:
+            sides = (random_team(self.database, team_size), random_team(self.database, team_size))
+        else:
+            sides = tuple(Team([self.database.pokemon(name) for name in names]) for names in teams)
+        battle_id = self.next_id
+        self.next_id += 1
+        battle = self.battles[battle_id] = TeamBattle(sides, self.battle_system, self.max_turns)
+        return {'battle': battle_id, 'actions': battle.legal_actions(0), 'finished': False}
+    
+    def act(self, battle_id: int, battle: TeamBattle, action: dict) -> dict:
+        with routed_to(EventRecorder()) as recorder:
+            battle.play_turn([action, team_ai_action(battle, 1)])
+            # Side 1 replacing a fainted Pokemon needs nothing from the client
+            while not battle.finished and not battle.legal_actions(0):
+                battle.play_turn([None, team_ai_action(battle, 1)])
+        if battle.finished:
+            del self.battles[battle_id]
+        return {
+            'battle': battle_id,
+            'turn': battle.turn,
+            'events': [[event.kind.name, event.side, event.subject, event.detail, event.value]
+                       for event in recorder.events],
+            'actions': battle.legal_actions(0),
+            'finished': battle.finished,
+            'winner': battle.winner,
+        }
+
+class BattleClient:
+    """Client for BattleServer; many battles can share one connection"""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.listener = asyncio.ensure_future(self._listen())
+    
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'BattleClient':
+        return cls(*await asyncio.open_connection(host, port))
+    
+    async def request(self, op: str, **fields) -> dict:
+        """Send one request and wait for its response; raises RuntimeError on server errors"""
+        if self.listener.done():
+            raise ConnectionError("Connection to the server is closed")
+        request_id = self.next_id
+        self.next_id += 1
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps({'id': request_id, 'op': op, **fields}).encode() + b'\n')
+        await self.writer.drain()
+        response = await future
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+    
+    async def _listen(self):
+        """Resolve pending requests as responses arrive; fail whatever is left when the connection ends"""
+        error = ConnectionError("Server closed the connection")
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (OSError, ValueError, AttributeError) as e:
+            error = ConnectionError(f"Lost the server connection: {e}")
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+    
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self.listener
+
+@dataclass
+class LoadTestResult:
+    battles: int
+    turns: int
+    seconds: float
+    latencies: List[float]  # Seconds per "act" round trip
+    
+    def battles_per_second(self) -> float:
+        return self.battles / self.seconds if self.seconds > 0 else 0.0
+    
+    def latency_percentile(self, percent: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+    
+    def summary(self) -> str:
+        return (f"{self.battles} battles, {self.turns} turns in {self.seconds:.1f} s: "
+                f"{self.battles_per_second():.0f} battles/s, {self.turns / max(self.seconds, 1e-9):.0f} turns/s, "
+                f"turn latency p50 {self.latency_percentile(50) * 1000:.1f} ms, "
+                f"p99 {self.latency_percentile(99) * 1000:.1f} ms")
+
+async def load_test(host: str, port: int, battles: int, concurrency: int = 1000, connections: int = 8,
+                    team_size: int = Team.MAX_SIZE) -> LoadTestResult:
+    """Play ``battles`` team battles with random legal actions, ``concurrency`` at a time"""
+    clients = [await BattleClient.connect(host, port) for _ in range(connections)]
+    latencies: List[float] = []
+    remaining = battles
+    turns = 0
+    
+    async def player(client: BattleClient):
+        nonlocal remaining, turns
+        while remaining > 0:
+            remaining -= 1
+            response = await client.request('new', team_size=team_size)
+            while not response['finished']:
+                action = random.choice(response['actions'])
+                sent = time.perf_counter()
+                response = await client.request('act', battle=response['battle'], action=action)
+                latencies.append(time.perf_counter() - sent)
+                turns += 1
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(player(clients[i % connections]) for i in range(min(concurrency, battles))))
+    finally:
+        for client in clients:
+            await client.close()
+    return LoadTestResult(battles, turns, time.perf_counter() - started, latencies)
+
+async def serve(host: str, port: int, database: Optional[RosterDatabase] = None):
+    server = await BattleServer(database).start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Battle server listening on {address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+async def run_load_test(battles: int, concurrency: int, connections: int, team_size: int,
+                        address: Optional[Tuple[str, int]] = None,
+                        database: Optional[RosterDatabase] = None) -> LoadTestResult:
+    """Load-test the server at ``address``, or an in-process one when it is None"""
+    if address is not None:
+        return await load_test(*address, battles, concurrency, connections, team_size)
+    server = await BattleServer(database).start()
+    async with server:
+        host, port = server.sockets[0].getsockname()[:2]
+        return await load_test(host, port, battles, concurrency, connections, team_size)
+
+def parse_address(text: str) -> Tuple[str, int]:
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def main(ai: Optional[ExpectimaxAI] = None, database: Optional[RosterDatabase] = None):
     print("\n=== Welcome to Pokémon Battle Simulator! ===\n")
-    battle_system = BattleSystem()
-    pokemon_roster = create_pokemon_roster()
+    battle_system = BattleSystem(database)
+    pokemon_roster = create_pokemon_roster(database)
     
     print("Available Pokémon:")
     pokemon_names = list(pokemon_roster.keys())
     player_pokemon = pokemon_roster[pokemon_names[display_menu(pokemon_names)]]
     
     computer_pokemon = random.choice([p for p in pokemon_roster.values() if p != player_pokemon])
+    computer_pokemon.side = 1
     print(f"\nYou chose {player_pokemon.name}! Opponent chose {computer_pokemon.name}!")
     
     while not (player_pokemon.is_fainted() or computer_pokemon.is_fainted()):
@@ -260,7 +2042,7 @@ def main():
             move = moves[display_menu([str(move) for move in moves])]
             
             if player_pokemon.can_move():
-                print(f"\n{player_pokemon.name} used {move.name}!")
+                emit(EventKind.MOVE_USED, player_pokemon.name, move.name, side=player_pokemon.side)
                 damage = battle_system.calculate_damage(move, player_pokemon, computer_pokemon)
                 computer_pokemon.current_hp = max(0, computer_pokemon.current_hp - damage)
                 turn_completed = True
@@ -283,19 +2065,10 @@ def main():
         # Computer turn
         print(f"\n{computer_pokemon.name}'s turn!")
         time.sleep(1)  # Add dramatic pause
-        
-        if computer_pokemon.current_hp < computer_pokemon.max_hp * 0.3:
-            # Try to use a healing item
-            for item_name, item in computer_pokemon.items.items():
-                if item.quantity > 0:
-                    computer_pokemon.use_item(item_name)
-                    break
-        
-        if computer_pokemon.can_move():
-            computer_move = get_computer_move(computer_pokemon)
-            print(f"\n{computer_pokemon.name} used {computer_move.name}!")
-            damage = battle_system.calculate_damage(computer_move, computer_pokemon, player_pokemon)
-            player_pokemon.current_hp = max(0, player_pokemon.current_hp - damage)
+        if ai is None:
+            computer_turn(battle_system, computer_pokemon, player_pokemon)
+        else:
+            expectimax_turn(battle_system, ai, computer_pokemon, player_pokemon)
         
         # Apply status effects at end of turn
         player_pokemon.apply_status_effects()
@@ -305,5 +2078,125 @@ def main():
             print(f"\n{player_pokemon.name} fainted! You lose!")
             break
 
+def team_main(team_size: int, database: Optional[RosterDatabase] = None):
+    print(f"\n=== Welcome to Pokémon Battle Simulator! ({team_size} vs {team_size}) ===\n")
+    database = load_database() if database is None else database
+    battle = TeamBattle((random_team(database, team_size), random_team(database, team_size)), BattleSystem(database))
+    player, computer = battle.teams
+    print("Your team: " + ", ".join(pokemon.name for pokemon in player.members))
+    print("Opponent's team: " + ", ".join(pokemon.name for pokemon in computer.members))
+    
+    while not battle.finished:
+        legal = battle.legal_actions(0)
+        action = None
+        if battle.needs_switch[0]:
+            print("\nChoose your next Pokémon:")
+            action = legal[display_menu([display_health_bar(player.members[a['switch']]) for a in legal])]
+        elif legal:
+            print("\n" + "="*50)
+            print(display_health_bar(player.current))
+            print(display_health_bar(computer.current))
+            print(f"\n{player.current.name}'s turn!")
+            choice = display_menu(["Fight", "Use Item", "Switch"])
+            kind = ['move', 'item', 'switch'][choice]
+            options = [a for a in legal if kind in a]
+            if not options:
+                print("Nothing to choose from!")
+                continue
+            if kind == 'move':
+                labels = [str(player.current.moves[a['move']]) for a in options]
+            elif kind == 'item':
+                labels = [f"{a['item']} (x{player.current.items[a['item']].quantity})" for a in options]
+            else:
+                labels = [display_health_bar(player.members[a['switch']]) for a in options]
+            action = options[display_menu(labels)]
+        battle.play_turn([action, team_ai_action(battle, 1)])
+    
+    if battle.winner is None:
+        print("\nThe battle ended in a draw!")
+    else:
+        print("\nYou win!" if battle.winner == 0 else "\nYou lose!")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Pokémon Battle Simulator")
+    parser.add_argument('--simulate', type=int, metavar='BATTLES',
+                        help="Run BATTLES headless AI-vs-AI battles per matchup and print win probabilities")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for --simulate and --tournament")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for --simulate and --tournament")
+    parser.add_argument('--vectorized', action='store_true', help="Play --simulate shards on the NumPy engine")
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help="Battles per shard (default 1000, or 100000 with --vectorized)")
+    parser.add_argument('--event-log', metavar='FILE', help="Record every --simulate battle to a binary event log")
+    parser.add_argument('--replay', metavar='FILE', help="Print the battles recorded in an event log")
+    parser.add_argument('--battle', type=int, default=None, help="Only replay this battle (numbered from 1)")
+    parser.add_argument('--ai', choices=['heuristic', 'expectimax'], default='heuristic',
+                        help="Opponent for the interactive game")
+    parser.add_argument('--think-time', type=float, default=0.5, help="Seconds per turn for the expectimax AI")
+    parser.add_argument('--roster', metavar='PATH',
+                        help="Roster JSON file, directory of CSV files, or compiled database (default: built-in)")
+    parser.add_argument('--compile-roster', metavar='OUT', help="Compile --roster (or the built-in roster) to OUT")
+    parser.add_argument('--tournament', metavar='DB',
+                        help="Run (or resume) a round-robin tournament stored in the SQLite file DB")
+    parser.add_argument('--battles-per-matchup', type=int, default=100, help="Battles per --tournament matchup")
+    parser.add_argument('--policies', default=','.join(AI_POLICIES),
+                        help="Comma-separated AI policies entered in --tournament")
+    parser.add_argument('--team-size', type=int, default=None,
+                        help="Play an interactive team battle with this many Pokémon per side (up to 6)")
+    parser.add_argument('--serve', metavar='HOST:PORT', help="Run the JSON-lines battle server")
+    parser.add_argument('--load-test', type=int, metavar='BATTLES',
+                        help="Play BATTLES random team battles against a server and report throughput")
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help="Server for --load-test (default: an in-process server)")
+    parser.add_argument('--concurrency', type=int, default=1000, help="Battles in flight during --load-test")
+    parser.add_argument('--connections', type=int, default=8, help="Client connections for --load-test")
+    args = parser.parse_args()
+    
+    if args.compile_roster:
+        data = DEFAULT_ROSTER_DATA if args.roster is None else load_roster_data(args.roster)
+        with open(args.compile_roster, 'wb') as f:
+            f.write(RosterDatabase.compile(data))
+        database = RosterDatabase.open(args.compile_roster)
+        print(f"Compiled {len(database.species_names)} species and {database.move_count} moves "
+              f"to {args.compile_roster}")
+    elif args.replay:
+        count = replay(args.replay, battle=args.battle)
+        print(f"\n{count} battles in {args.replay}")
+    elif args.tournament:
+        tournament = Tournament(args.tournament, args.battles_per_matchup, args.seed,
+                                args.policies.split(','), args.roster)
+        try:
+            played, skipped = tournament.run(
+                args.workers, lambda done, total: print(f"\rMatchups: {done}/{total}", end="", flush=True))
+            print(f"\nPlayed {played} matchups ({skipped} already recorded in {args.tournament})\n")
+            print(tournament.format_ratings())
+        finally:
+            tournament.close()
+    elif args.serve:
+        asyncio.run(serve(*parse_address(args.serve), load_database(args.roster)))
+    elif args.load_test:
+        address = parse_address(args.connect) if args.connect else None
+        result = asyncio.run(run_load_test(args.load_test, args.concurrency, args.connections,
+                                           args.team_size or Team.MAX_SIZE, address, load_database(args.roster)))
+        print(result.summary())
+    elif args.simulate:
+        if args.event_log and (args.workers > 1 or args.vectorized):
+            parser.error("--event-log needs the scalar engine in a single process (no --workers or --vectorized)")
+        shard_size = args.shard_size or (100000 if args.vectorized else 1000)
+        event_sink = BinaryEventLog(args.event_log) if args.event_log else None
+        simulator = BattleSimulator(seed=args.seed, shard_size=shard_size, vectorized=args.vectorized,
+                                    event_sink=event_sink, roster=args.roster)
+        try:
+            result = simulator.run(args.simulate, workers=args.workers)
+        finally:
+            if event_sink is not None:
+                event_sink.close()
+        print(result.format_table())
+        print(f"\n{result.total_battles()} battles in {result.seconds:.1f} s "
+              f"on {max(args.workers, 1)} worker(s) ({result.battles_per_second():.0f} battles/s)")
+    else:
+        database = load_database(args.roster)
+        ai = ExpectimaxAI(BattleSystem(database), time_budget=args.think_time) if args.ai == 'expectimax' else None
+        if args.team_size:
+            team_main(args.team_size, database)
+        else:
+            main(ai, database)
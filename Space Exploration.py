@@ -28,6 +28,9 @@ ship_img = pygame.image.load("spaceship.png").convert_alpha()
 ship_img = pygame.transform.scale(ship_img, (40, 40))
 asteroid_img = pygame.image.load("asteroid.png").convert_alpha()
 asteroid_img = pygame.transform.scale(asteroid_img, (30, 30))
+# Rotating an image every frame is slow, so asteroids pick from pre-rotated frames
+ASTEROID_ROTATION_STEP = 5
+asteroid_frames = [pygame.transform.rotate(asteroid_img, angle) for angle in range(0, 360, ASTEROID_ROTATION_STEP)]
 powerup_img = pygame.image.load("powerup.png").convert_alpha()
 powerup_img = pygame.transform.scale(powerup_img, (20, 20))
 collect_sound = pygame.mixer.Sound("collect.wav")
@@ -122,6 +125,7 @@ class Asteroid:
         self.x = random.randint(0, width)
         self.y = -50
         self.speed = random.uniform(1, 3)
+        self.radius = 15
         self.rotation = 0
         self.rotation_speed = random.uniform(-5, 5)
 
@@ -133,7 +137,7 @@ class Asteroid:
             self.x = random.randint(0, width)
 
     def draw(self, screen):
-        rotated_asteroid = pygame.transform.rotate(asteroid_img, self.rotation)
+        rotated_asteroid = asteroid_frames[int(self.rotation // ASTEROID_ROTATION_STEP) % len(asteroid_frames)]
         screen.blit(rotated_asteroid, (self.x - rotated_asteroid.get_width() // 2, self.y - rotated_asteroid.get_height() // 2))
 
 # Power-up class
@@ -142,6 +146,7 @@ class PowerUp:
         self.x = random.randint(0, width)
         self.y = -50
         self.speed = random.uniform(1, 2)
+        self.radius = 10
         self.type = random.choice(["speed", "shield"])
 
     def move(self):
@@ -153,6 +158,83 @@ class PowerUp:
     def draw(self, screen):
         screen.blit(powerup_img, (self.x - 10, self.y - 10))
 
+# Spatial hash grid for collision checks
+class SpatialGrid:
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        # Where each object's centre may go before its box leaves the cells it is filed under
+        self.bounds = {}
+
+    def cell_range(self, x, y, radius):
+        size = self.cell_size
+        return (range(int((x - radius) // size), int((x + radius) // size) + 1),
+                range(int((y - radius) // size), int((y + radius) // size) + 1))
+
+    def update(self, *groups):
+        # Each object goes in every cell its bounding box touches, so big planets are found too.
+        # An object is only re-filed once its box leaves the block of cells it was filed under.
+        size = self.cell_size
+        cells, bounds = self.cells, self.bounds
+        for group in groups:
+            for obj in group:
+                x, y = obj.x, obj.y
+                bound = bounds.get(obj)
+                if bound is not None:
+                    left, right, top, bottom, r = bound
+                    if left <= x < right and top <= y < bottom:
+                        continue
+                    for cx in range(int(left - r) // size, int(right + r) // size):
+                        for cy in range(int(top - r) // size, int(bottom + r) // size):
+                            bucket = cells[cx, cy]
+                            bucket.discard(obj)
+                            if not bucket:
+                                del cells[cx, cy]
+                r = obj.radius
+                columns, rows = self.cell_range(x, y, r)
+                for cx in columns:
+                    for cy in rows:
+                        bucket = cells.get((cx, cy))
+                        if bucket is None:
+                            bucket = cells[cx, cy] = set()
+                        bucket.add(obj)
+                bounds[obj] = (columns.start * size + r, columns.stop * size - r,
+                               rows.start * size + r, rows.stop * size - r, r)
+
+    def query(self, x, y, radius, kind=None):
+        # Objects (of class kind) whose circle overlaps the circle at (x, y)
+        found = []
+        seen = set()
+        columns, rows = self.cell_range(x, y, radius)
+        for cx in columns:
+            for cy in rows:
+                for obj in self.cells.get((cx, cy), ()):
+                    if obj in seen or (kind is not None and not isinstance(obj, kind)):
+                        continue
+                    seen.add(obj)
+                    if math.hypot(obj.x - x, obj.y - y) < radius + obj.radius:
+                        found.append(obj)
+        return found
+
+    def pairs(self, kind=None):
+        # Every overlapping pair of objects (of class kind), each reported once
+        size = self.cell_size
+        for cell, bucket in self.cells.items():
+            if len(bucket) < 2:
+                continue
+            bucket = [obj for obj in bucket if kind is None or isinstance(obj, kind)]
+            for i, a in enumerate(bucket):
+                ax, ay, ar = a.x, a.y, a.radius
+                for b in bucket[i + 1:]:
+                    dx, dy, reach = ax - b.x, ay - b.y, ar + b.radius
+                    if dx * dx + dy * dy >= reach * reach:
+                        continue
+                    # Objects sharing several cells are reported from the first one only
+                    first = (int(max(ax - ar, b.x - b.radius) // size),
+                             int(max(ay - ar, b.y - b.radius) // size))
+                    if first == cell:
+                        yield a, b
+
 # Game state
 class GameState:
     def __init__(self):
@@ -224,6 +306,7 @@ stars = [Star() for _ in range(100)]
 asteroids = [Asteroid() for _ in range(5)]
 powerups = [PowerUp() for _ in range(2)]
 trading_system = TradingSystem()
+collision_grid = SpatialGrid()
 
 # Main game loop
 running = True
@@ -269,33 +352,28 @@ while running:
             powerup.move()
 
         # Check collisions
-        for planet in planets:
-            distance = math.hypot(ship.x - planet.x, ship.y - planet.y)
-            if distance < planet.radius + 20:
-                if planet.resources > 0:
-                    ship.resources[planet.resource_type] += 1
-                    planet.resources -= 1
-                    game_state.score += 10
-                    collect_sound.play()
-
-        for asteroid in asteroids:
-            distance = math.hypot(ship.x - asteroid.x, ship.y - asteroid.y)
-            if distance < 30:
-                ship.shield -= 10
-                crash_sound.play()
-                if ship.shield <= 0:
-                    game_state.game_over = True
-
-        for powerup in powerups:
-            distance = math.hypot(ship.x - powerup.x, ship.y - powerup.y)
-            if distance < 30:
-                if powerup.type == "speed":
-                    ship.powerup_timer = 300  # 5 seconds
-                elif powerup.type == "shield":
-                    ship.shield = min(ship.shield + 50, 100)
-                powerup_sound.play()
-                powerup.y = -50
-                powerup.x = random.randint(0, width)
+        collision_grid.update(planets, asteroids, powerups)
+        for planet in collision_grid.query(ship.x, ship.y, 20, Planet):
+            if planet.resources > 0:
+                ship.resources[planet.resource_type] += 1
+                planet.resources -= 1
+                game_state.score += 10
+                collect_sound.play()
+
+        for asteroid in collision_grid.query(ship.x, ship.y, 15, Asteroid):
+            ship.shield -= 10
+            crash_sound.play()
+            if ship.shield <= 0:
+                game_state.game_over = True
+
+        for powerup in collision_grid.query(ship.x, ship.y, 20, PowerUp):
+            if powerup.type == "speed":
+                ship.powerup_timer = 300  # 5 seconds
+            elif powerup.type == "shield":
+                ship.shield = min(ship.shield + 50, 100)
+            powerup_sound.play()
+            powerup.y = -50
+            powerup.x = random.randint(0, width)
 
         # Check mission completion
         if game_state.check_mission_complete(ship):
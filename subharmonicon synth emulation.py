@@ -1,20 +1,40 @@
 import numpy as np
 from scipy import signal
-import sounddevice as sd
 import threading
 import time
+import wave
+import argparse
+import json
+import math
+import platform
+import tracemalloc
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import keyboard
 from dataclasses import dataclass
-import queue
-from typing import List, Dict, Optional, Tuple
+from abc import ABC, abstractmethod
+import heapq
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional, Tuple
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # PortAudio missing: only the null backend is available
+    sd = None
+
+try:
+    import mido
+except ImportError:  # Live MIDI input is optional; MIDI files are parsed without it
+    mido = None
 
 @dataclass
 class OscillatorParams:
     frequency: float
     waveform: str
     level: float
-    phase: float
     sub_levels: List[float]
+    ratio: float = 1.0  # Frequency relative to the played note
 
 @dataclass
 class ModulationParams:
@@ -23,44 +43,1669 @@ class ModulationParams:
     shape: str
     destination: str
 
+class ScratchBuffer:
+    """Reusable work array handed out as views of whatever shape a block needs.
+
+    The backing array only grows, so once it has reached the largest block size
+    every later ``view`` call is allocation free.
+    """
+    def __init__(self, size: int = 0, dtype=float):
+        self.array = np.zeros(size, dtype=dtype)
+
+    def view(self, *shape: int) -> np.ndarray:
+        """Contiguous view of the first prod(shape) elements, growing the array if needed"""
+        size = math.prod(shape)
+        if size > len(self.array):
+            self.array = np.zeros(size, dtype=self.array.dtype)
+        return self.array[:size].reshape(shape)
+
+class WavetableBank:
+    """Band-limited single-cycle tables for every waveform, mip-mapped by octave.
+
+    Mip level k holds only the harmonics that stay below Nyquist for
+    fundamentals up to ``base_frequency * 2 ** (k + 1)``.
+    """
+    WAVEFORMS = ['saw', 'square', 'triangle', 'sine']
+
+    def __init__(self, sample_rate: int, table_size: int = 2048,
+                 base_frequency: float = 20.0, num_levels: int = 11):
+        self.sample_rate = sample_rate
+        self.table_size = table_size
+        self.base_frequency = base_frequency
+        self.num_levels = num_levels
+        # One guard sample per table so interpolation never has to wrap
+        self.tables = np.zeros((len(self.WAVEFORMS), num_levels, table_size + 1))
+        for level in range(num_levels):
+            max_frequency = base_frequency * 2 ** (level + 1)
+            harmonics = int(min(sample_rate / 2 / max_frequency, table_size / 2 - 1))
+            for index, waveform in enumerate(self.WAVEFORMS):
+                table = self.build_table(waveform, max(harmonics, 1))
+                self.tables[index, level, :-1] = table
+                self.tables[index, level, -1] = table[0]
+        self.flat_tables = self.tables.reshape(-1)
+        self.work = ScratchBuffer()
+        self.work_index = ScratchBuffer(dtype=np.intp)
+        self.row_work = ScratchBuffer()
+        self.time = ScratchBuffer()
+        self.counting = np.zeros(0)
+
+    def build_table(self, waveform: str, harmonics: int) -> np.ndarray:
+        """Additive synthesis of one band-limited cycle via inverse FFT"""
+        spectrum = np.zeros(self.table_size // 2 + 1, dtype=complex)
+        h = np.arange(1, harmonics + 1)
+        # Coefficients match scipy's sawtooth/square/triangle phase conventions
+        if waveform == 'saw':
+            spectrum[h] = 1j * (2 / np.pi) / h
+        elif waveform == 'square':
+            odd = h[h % 2 == 1]
+            spectrum[odd] = -1j * (4 / np.pi) / odd
+        elif waveform == 'triangle':
+            odd = h[h % 2 == 1]
+            spectrum[odd] = -(8 / np.pi ** 2) / odd ** 2
+        else:  # sine
+            spectrum[1] = -1j
+        return np.fft.irfft(spectrum * self.table_size / 2, self.table_size)
+
+    def waveform_index(self, waveform: str) -> int:
+        """Table index for a waveform name, unknown names fall back to sine"""
+        return self.WAVEFORMS.index(waveform) if waveform in self.WAVEFORMS else self.WAVEFORMS.index('sine')
+
+    def mip_levels(self, frequencies: np.ndarray) -> np.ndarray:
+        """Pick the richest table that stays alias-free for each frequency"""
+        ratio = np.maximum(np.asarray(frequencies, dtype=float), 1e-6) / self.base_frequency
+        levels = np.ceil(np.log2(ratio)) - 1
+        return np.clip(levels, 0, self.num_levels - 1).astype(int)
+
+    def reserve(self, rows: int, samples: int):
+        """Grow the work buffers up front so later renders of this size never allocate"""
+        self.work.view(2, rows, samples)
+        self.work_index.view(rows, samples)
+        self.row_work.view(rows, 4)
+        self.time.view(2, samples)
+        if len(self.counting) < samples:
+            self.counting = np.arange(samples, dtype=float)
+
+    def render_rows(self, waveforms: np.ndarray, frequencies: np.ndarray, phases: np.ndarray,
+                    samples: int, pitch: Optional[np.ndarray] = None,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Render each row separately into a (rows, samples) array, advancing ``phases`` in place.
+
+        ``waveforms`` holds table indices as floats and ``pitch`` is an optional
+        per-sample frequency multiplier shared by all rows. Per-row terms are
+        spread over the block with rank-2 matrix products rather than broadcasting,
+        which would make numpy allocate iterator buffers.
+        """
+        rows = len(frequencies)
+        out = np.empty((rows, samples)) if out is None else out
+        position, frac = self.work.view(2, rows, samples)
+        index = self.work_index.view(rows, samples)
+        coefficients = self.row_work.view(rows, 4)
+        increments, start, levels, offsets = coefficients.T
+        
+        # time[0] is the phase ramp in samples, time[1] is all ones
+        time = self.time.view(2, samples)
+        time[1].fill(1.0)
+        if pitch is None:
+            if len(self.counting) < samples:
+                self.counting = np.arange(samples, dtype=float)
+            time[0] = self.counting[:samples]
+            advance = samples
+            peak = 1.0
+        else:
+            time[0, 0] = 0.0
+            np.cumsum(pitch[:-1], out=time[0, 1:])
+            advance = time[0, -1] + pitch[-1]
+            peak = pitch.max()
+            
+        # Richest alias-free mip level for the highest frequency each row reaches
+        np.multiply(frequencies, peak, out=levels)
+        np.maximum(levels, 1e-6, out=levels)
+        levels /= self.base_frequency
+        np.log2(levels, out=levels)
+        np.ceil(levels, out=levels)
+        levels -= 1
+        np.clip(levels, 0, self.num_levels - 1, out=levels)
+        np.multiply(waveforms, self.num_levels, out=offsets)
+        offsets += levels
+        offsets *= self.table_size + 1
+        
+        np.divide(frequencies, self.sample_rate, out=increments)
+        start[:] = phases
+        np.matmul(coefficients[:, :2], time, out=position)
+        np.remainder(position, 1.0, out=position)
+        position *= self.table_size
+        np.floor(position, out=frac)
+        position -= frac
+        np.matmul(coefficients[:, 3:], time[1:], out=out)
+        frac += out
+        np.copyto(index, frac, casting='unsafe')
+        
+        # Linear interpolation between two gathers from the flattened bank
+        np.take(self.flat_tables, index, out=out, mode='clip')
+        index += 1
+        np.take(self.flat_tables, index, out=frac, mode='clip')
+        frac -= out
+        frac *= position
+        out += frac
+        
+        np.multiply(increments, advance, out=levels)
+        phases += levels
+        np.remainder(phases, 1.0, out=phases)
+        return out
+
+class ModulationMatrix:
+    """Evaluates every modulation routing as arrays, once per block.
+
+    Sources are LFOs (sine, triangle, saw, square) or 'envelope', which follows
+    the loudest voice envelope. Routings are summed per destination and each
+    destination gets a per-sample linear ramp from the previous block's value.
+    Units: 'frequency' and 'filter_cutoff' are in octaves, 'level' and
+    'sub_levels' are relative gain.
+    """
+    DESTINATIONS = ['frequency', 'filter_cutoff', 'level', 'sub_levels']
+    SHAPES = ['sine', 'triangle', 'saw', 'square', 'envelope']
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.set_routings([])
+
+    def set_routings(self, modulations: List[ModulationParams]):
+        """Pack the routings into arrays; call whenever the modulation list changes"""
+        count = len(modulations)
+        self.amounts = np.array([mod.amount for mod in modulations], dtype=float)
+        self.rates = np.array([mod.rate for mod in modulations], dtype=float)
+        self.shapes = np.array([self.SHAPES.index(mod.shape) for mod in modulations], dtype=int)
+        self.destinations = np.array([self.DESTINATIONS.index(mod.destination) for mod in modulations],
+                                     dtype=int)
+        # One-hot shape selector and amount-weighted destination matrix
+        self.selector = np.zeros((len(self.SHAPES), count))
+        self.selector[self.shapes, np.arange(count)] = 1.0
+        self.routing = np.zeros((len(self.DESTINATIONS), count))
+        self.routing[self.destinations, np.arange(count)] = self.amounts
+        self.phases = np.zeros(count)
+        self.increments = np.zeros(count)
+        self.shape_values = np.zeros((len(self.SHAPES), count))
+        self.values = np.zeros(count)
+        self.active = np.bincount(self.destinations, minlength=len(self.DESTINATIONS)) > 0
+        self.previous = np.zeros(len(self.DESTINATIONS))
+        self.current = np.zeros(len(self.DESTINATIONS))
+        self.lines = np.zeros((len(self.DESTINATIONS), 2))
+        self.time = np.zeros((2, 0))
+        self.ramp_buffer = ScratchBuffer()
+        self.factor_buffer = ScratchBuffer()
+        self.ramps = self.ramp_buffer.view(len(self.DESTINATIONS), 0)
+        self.factors = self.factor_buffer.view(3, 0)
+
+    def process(self, frames: int, envelope: float = 0.0):
+        """Advance all sources by one block and build the per-sample destination ramps"""
+        np.copyto(self.previous, self.current)
+        if len(self.amounts):
+            p = self.phases
+            np.multiply(self.rates, frames, out=self.increments)
+            self.increments /= self.sample_rate
+            p += self.increments
+            np.remainder(p, 1.0, out=p)
+            sine, triangle, saw, square, follower = self.shape_values
+            np.multiply(p, 2 * np.pi, out=sine)
+            np.sin(sine, out=sine)
+            np.subtract(p, 0.5, out=triangle)
+            np.abs(triangle, out=triangle)
+            triangle *= -4
+            triangle += 1
+            np.multiply(p, 2, out=saw)
+            saw -= 1
+            np.multiply(p, 2, out=square)
+            np.floor(square, out=square)
+            square *= -2
+            square += 1
+            follower.fill(envelope)
+            self.shape_values *= self.selector
+            np.sum(self.shape_values, axis=0, out=self.values)
+            np.matmul(self.routing, self.values, out=self.current)
+            
+        # Ramp from the previous value to the current one as a (D, 2) x (2, frames) product
+        if self.time.shape[1] != frames:
+            self.time = np.vstack([np.ones(frames), np.arange(1, frames + 1) / frames])
+        self.lines[:, 0] = self.previous
+        np.subtract(self.current, self.previous, out=self.lines[:, 1])
+        self.ramps = self.ramp_buffer.view(len(self.DESTINATIONS), frames)
+        np.matmul(self.lines, self.time, out=self.ramps)
+        self.factors = self.factor_buffer.view(3, frames)
+
+    def pitch_factor(self, start: int, end: int) -> Optional[np.ndarray]:
+        """Per-sample frequency multiplier, or None when nothing modulates pitch"""
+        if not self.active[0]:
+            return None
+        return np.exp2(self.ramps[0, start:end], out=self.factors[0, start:end])
+
+    def cutoff_factor(self) -> float:
+        """Filter cutoff multiplier for this block (the filter glides within the block)"""
+        return float(np.exp2(self.current[1])) if self.active[1] else 1.0
+
+    def level_factor(self) -> Optional[np.ndarray]:
+        """Per-sample output gain, or None"""
+        if not self.active[2]:
+            return None
+        level = np.add(self.ramps[2], 1.0, out=self.factors[1])
+        return np.maximum(level, 0.0, out=level)
+
+    def sub_factor(self, start: int, end: int) -> Optional[np.ndarray]:
+        """Per-sample gain for the subharmonic rows, or None"""
+        if not self.active[3]:
+            return None
+        gain = np.add(self.ramps[3, start:end], 1.0, out=self.factors[2, start:end])
+        return np.maximum(gain, 0.0, out=gain)
+
+class VoicePool:
+    """Preallocated polyphonic voice state with oldest/quietest voice stealing.
+
+    Each voice stores its note frequency, one phase per oscillator row, and a
+    linear attack/release envelope (stage, level, samples left until release).
+    Sounding voices are kept packed at the front of every array, so a block
+    renders through fixed-size views instead of gathering the active indices.
+    """
+    IDLE, HELD, RELEASE = 0, 1, 2
+
+    def __init__(self, num_voices: int, rows_per_voice: int, sample_rate: int,
+                 attack: float = 0.005, release: float = 0.05):
+        self.num_voices = num_voices
+        self.rows_per_voice = rows_per_voice
+        self.sample_rate = sample_rate
+        self.attack_rate = 1.0 / max(attack * sample_rate, 1.0)
+        self.release_rate = 1.0 / max(release * sample_rate, 1.0)
+        self.frequency = np.zeros(num_voices)
+        self.velocity = np.zeros(num_voices)
+        self.phases = np.zeros((num_voices, rows_per_voice))
+        self.stage = np.zeros(num_voices, dtype=np.int8)
+        self.level = np.zeros(num_voices)
+        self.gate = np.zeros(num_voices, dtype=np.int64)
+        self.started = np.zeros(num_voices, dtype=np.int64)
+        self.count = 0
+        self.peak_count = 0
+        self.note_counter = 0
+        self.voices_stolen = 0
+        
+        # Per-row oscillator settings and work buffers reused by every block
+        self.row_waveforms = np.zeros(rows_per_voice)
+        self.row_ratios = np.zeros((1, rows_per_voice))
+        self.row_amplitudes = np.zeros(rows_per_voice)
+        self.main_amplitudes = np.zeros(rows_per_voice)
+        self.sub_amplitudes = np.zeros(rows_per_voice)
+        self.voice_waveforms = np.zeros((num_voices, rows_per_voice))
+        self.voice_frequencies = np.zeros((num_voices, rows_per_voice))
+        self.lines = np.zeros((num_voices, 2))
+        self.gate_samples = np.zeros(num_voices)
+        self.finished = np.zeros(num_voices, dtype=bool)
+        self.silent = np.zeros(num_voices, dtype=bool)
+        self.time = np.zeros((2, 0))
+        self.values = ScratchBuffer()
+        self.envelope_work = ScratchBuffer()
+        self.signal_work = ScratchBuffer()
+        self.sub_mix = ScratchBuffer()
+
+    def reserve(self, samples: int):
+        """Size the work buffers for full polyphony at the given block length"""
+        self.values.view(self.num_voices * self.rows_per_voice, samples)
+        self.envelope_work.view(2, self.num_voices, samples)
+        self.signal_work.view(2, self.num_voices, samples)
+        self.sub_mix.view(samples)
+        self.time_matrix(samples)
+
+    def time_matrix(self, samples: int) -> np.ndarray:
+        """(2, samples) rows of ones and 1..samples, for evaluating envelope lines"""
+        if self.time.shape[1] < samples:
+            self.time = np.vstack([np.ones(samples), np.arange(1, samples + 1)])
+        return self.time[:, :samples]
+
+    def allocate(self) -> int:
+        """Free voice if any, else the quietest releasing voice, else the oldest one"""
+        if self.count < self.num_voices:
+            return self.count
+        self.voices_stolen += 1
+        releasing = np.flatnonzero(self.stage == self.RELEASE)
+        if len(releasing):
+            return int(releasing[np.argmin(self.level[releasing])])
+        return int(np.argmin(self.started))
+
+    def note_on(self, frequency: float, duration_samples: int, velocity: float = 1.0) -> int:
+        """Start a note; a stolen voice keeps its current level so it doesn't click"""
+        voice = self.allocate()
+        if voice == self.count:
+            self.count += 1
+            self.peak_count = max(self.peak_count, self.count)
+            self.level[voice] = 0.0
+        self.frequency[voice] = frequency
+        self.velocity[voice] = velocity
+        self.stage[voice] = self.HELD
+        self.gate[voice] = duration_samples
+        self.note_counter += 1
+        self.started[voice] = self.note_counter
+        return voice
+
+    def note_off(self, frequency: float):
+        """Release every held voice playing this frequency"""
+        held = (self.stage == self.HELD) & np.isclose(self.frequency, frequency)
+        self.gate[held] = 0
+        self.stage[held] = self.RELEASE
+
+    def remove(self, voice: int):
+        """Free a voice by moving the last sounding voice into its slot"""
+        last = self.count - 1
+        for array in (self.frequency, self.velocity, self.phases, self.stage,
+                      self.level, self.gate, self.started):
+            array[voice] = array[last]
+        self.stage[last] = self.IDLE
+        self.level[last] = 0.0
+        self.gate[last] = 0
+        self.count = last
+
+    def release_idle(self):
+        """Drop voices whose release has finished from the packed range"""
+        idle = self.finished[:self.count]
+        np.equal(self.stage[:self.count], self.IDLE, out=idle)
+        if idle.any():
+            for voice in np.flatnonzero(idle)[::-1]:
+                self.remove(int(voice))
+
+    def envelopes(self, samples: int) -> np.ndarray:
+        """Per-sample envelopes of the sounding voices, advancing their state.
+
+        Attack and release are straight lines and the release line never lies
+        below the attack line before the gate ends, so the envelope is simply
+        the lower of the two.
+        """
+        k = self.count
+        time = self.time_matrix(samples)
+        held, released = self.envelope_work.view(2, k, samples)
+        lines = self.lines[:k]
+        gate = self.gate_samples[:k]
+        np.copyto(gate, self.gate[:k])
+        
+        # Attack: min(1, level + attack_rate * t)
+        lines[:, 0] = self.level[:k]
+        lines[:, 1] = self.attack_rate
+        np.matmul(lines, time, out=held)
+        np.minimum(held, 1.0, out=held)
+        
+        # Release: max(0, release_start - release_rate * (t - gate))
+        release_start = lines[:, 0]
+        np.multiply(gate, self.attack_rate, out=release_start)
+        release_start += self.level[:k]
+        np.minimum(release_start, 1.0, out=release_start)
+        gate *= self.release_rate
+        release_start += gate
+        lines[:, 1] = -self.release_rate
+        np.matmul(lines, time, out=released)
+        np.maximum(released, 0.0, out=released)
+        env = np.minimum(held, released, out=held)
+        
+        self.level[:k] = env[:, -1]
+        self.gate[:k] -= samples
+        np.maximum(self.gate[:k], 0, out=self.gate[:k])
+        finished = self.finished[:k]
+        silent = self.silent[:k]
+        np.equal(self.gate[:k], 0, out=finished)
+        np.copyto(self.stage[:k], self.RELEASE, where=finished)
+        np.less_equal(self.level[:k], 0.0, out=silent)
+        np.logical_and(finished, silent, out=finished)
+        np.copyto(self.stage[:k], self.IDLE, where=finished)
+        return env
+
+    def update_rows(self, wavetables: WavetableBank, oscillators: List[OscillatorParams]):
+        """Copy waveform, frequency ratio and level of every oscillator row into the row arrays"""
+        count = len(oscillators)
+        for i, osc in enumerate(oscillators):
+            row = 3 * i
+            self.row_waveforms[row:row + 3] = wavetables.waveform_index(osc.waveform)
+            self.row_ratios[0, row] = osc.ratio
+            self.row_ratios[0, row + 1] = osc.ratio / 2
+            self.row_ratios[0, row + 2] = osc.ratio / 3
+            self.main_amplitudes[row] = osc.level / count
+            self.sub_amplitudes[row + 1] = osc.sub_levels[0] / count
+            self.sub_amplitudes[row + 2] = osc.sub_levels[1] / count
+        np.add(self.main_amplitudes, self.sub_amplitudes, out=self.row_amplitudes)
+
+    def render(self, wavetables: WavetableBank, oscillators: List[OscillatorParams], samples: int,
+               pitch: Optional[np.ndarray] = None, sub_gain: Optional[np.ndarray] = None,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Render all active voices as one batched (voices * rows, samples) operation"""
+        out = np.empty(samples) if out is None else out
+        k = self.count
+        if k == 0:
+            out.fill(0.0)
+            return out
+            
+        self.update_rows(wavetables, oscillators)
+        rows = k * self.rows_per_voice
+        frequencies = self.voice_frequencies[:k]
+        np.matmul(self.frequency[:k, None], self.row_ratios, out=frequencies)
+        waveforms = self.voice_waveforms[:k]
+        np.copyto(waveforms, self.row_waveforms)
+        values = wavetables.render_rows(waveforms.reshape(rows), frequencies.reshape(rows),
+                                        self.phases[:k].reshape(rows), samples, pitch,
+                                        out=self.values.view(rows, samples))
+        values = values.reshape(k, self.rows_per_voice, samples)
+        
+        env = self.envelopes(samples)
+        main, sub = self.signal_work.view(2, k, samples)
+        np.matmul(self.row_amplitudes if sub_gain is None else self.main_amplitudes, values, out=main)
+        main *= env
+        np.matmul(self.velocity[:k], main, out=out)
+        if sub_gain is not None:
+            # The sub gain is shared by every voice, so apply it after mixing them
+            np.matmul(self.sub_amplitudes, values, out=sub)
+            sub *= env
+            mix = np.matmul(self.velocity[:k], sub, out=self.sub_mix.view(samples))
+            mix *= sub_gain
+            out += mix
+        self.release_idle()
+        return out
+
+@lru_cache(maxsize=4096)
+def svf_lowpass_sos(cutoff: float, resonance: float, sample_rate: int) -> np.ndarray:
+    """Second-order section of a resonant state-variable low-pass.
+
+    This is the topology-preserving (trapezoidal) SVF low-pass output written as
+    a biquad; resonance 1.0 gives Q = 1/sqrt(2), i.e. the old Butterworth response.
+    """
+    g = np.tan(np.pi * cutoff / sample_rate)
+    k = np.sqrt(2) / max(resonance, 0.1)  # k = 1/Q
+    a0 = 1 + g * k + g * g
+    gg = g * g / a0
+    return np.array([[gg, 2 * gg, gg, 1.0, (2 * g * g - 2) / a0, (1 - g * k + g * g) / a0]])
+
+@lru_cache(maxsize=256)
+def svf_block_kernels(cutoff: float, resonance: float, sample_rate: int,
+                      length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Closed-form response of the SVF biquad over a block of ``length`` samples.
+
+    With the transposed direct form II state s at the start of a block x:
+        y     = (h * x)[:length] + s @ zero_input
+        s_end = state_input @ x + transition @ s
+    Returns (rfft of h padded to 2 * length, zero_input, state_input, transition).
+    """
+    sos = svf_lowpass_sos(cutoff, resonance, sample_rate)
+    a2 = sos[0, 5]
+    impulse = np.zeros(length + 1)
+    impulse[0] = 1.0
+    h = signal.sosfilt(sos, impulse)
+    # State after an impulse m + 1 samples back is (h[m + 1], -a2 * h[m]),
+    # except the second component right after the impulse, b2 - a2 * b0
+    state_input = np.empty((2, length))
+    state_input[0] = h[length:0:-1]
+    state_input[1, :-1] = -a2 * h[length - 1:0:-1]
+    state_input[1, -1] = sos[0, 2] - a2 * sos[0, 0]
+    zero_input = np.empty((2, length))
+    transition = np.empty((2, 2))
+    for component in range(2):
+        zi = np.zeros((1, 2))
+        zi[0, component] = 1.0
+        zero_input[component], zf = signal.sosfilt(sos, np.zeros(length), zi=zi)
+        transition[:, component] = zf[0]
+    return np.fft.rfft(h[:length], 2 * length), zero_input, state_input, transition
+
+class StreamingFilter:
+    """Resonant low-pass that keeps its state across blocks.
+
+    When the cutoff or resonance moves, the block is split into segments whose
+    coefficients glide geometrically from the previous setting to the new one.
+    Each segment is one FFT convolution plus a few small matrix products on
+    preallocated buffers, instead of a sosfilt call returning new arrays.
+    """
+    def __init__(self, sample_rate: int, segments: int = 8):
+        self.sample_rate = sample_rate
+        self.segments = segments
+        self.zi = np.zeros((1, 2))
+        self.cutoff = None
+        self.resonance = None
+        self.padded = ScratchBuffer()
+        self.spectrum = ScratchBuffer(dtype=complex)
+        self.next_state = np.zeros(2)
+        self.carry = np.zeros(2)
+
+    def kernels(self, cutoff: float, resonance: float, length: int):
+        """Cached block kernels for a segment, quantised so gliding settings still hit the cache"""
+        cutoff = min(max(cutoff, 20.0), self.sample_rate * 0.49)
+        return svf_block_kernels(round(cutoff, 1), round(resonance, 3), self.sample_rate, length)
+
+    def filter_segment(self, audio: np.ndarray, out: np.ndarray, cutoff: float, resonance: float):
+        """Filter one segment into out (which may be audio itself) and advance the state"""
+        n = len(audio)
+        if n == 0:
+            return
+        response, zero_input, state_input, transition = self.kernels(cutoff, resonance, n)
+        state = self.zi[0]
+        padded = self.padded.view(2 * n)
+        padded[:n] = audio
+        padded[n:] = 0.0
+        np.matmul(state_input, audio, out=self.next_state)
+        np.matmul(transition, state, out=self.carry)
+        self.next_state += self.carry
+        
+        spectrum = np.fft.rfft(padded, out=self.spectrum.view(n + 1))
+        spectrum *= response
+        np.fft.irfft(spectrum, 2 * n, out=padded)
+        np.matmul(state, zero_input, out=out)
+        out += padded[:n]
+        state[:] = self.next_state
+
+    def process(self, audio: np.ndarray, cutoff: float, resonance: float,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Filter one block, continuing from the previous block's state"""
+        out = np.empty_like(audio) if out is None else out
+        if self.cutoff is None:
+            self.cutoff, self.resonance = cutoff, resonance
+        if cutoff == self.cutoff and resonance == self.resonance:
+            self.filter_segment(audio, out, cutoff, resonance)
+            return out
+            
+        # Glide in equal segments; cutoff moves on a log scale like the ear hears it
+        n = len(audio)
+        ratio = max(cutoff, 1e-3) / max(self.cutoff, 1e-3)
+        for segment in range(self.segments):
+            start = n * segment // self.segments
+            end = n * (segment + 1) // self.segments
+            step = (segment + 1) / self.segments
+            self.filter_segment(audio[start:end], out[start:end], self.cutoff * ratio ** step,
+                                self.resonance + (resonance - self.resonance) * step)
+        self.cutoff, self.resonance = cutoff, resonance
+        return out
+
+class PartitionedConvolver:
+    """Uniformly partitioned overlap-save FFT convolution.
+
+    The impulse response is split into block-sized partitions whose spectra are
+    computed once. Each block costs one forward FFT, one inverse FFT and one
+    multiply-accumulate over the frequency-domain delay line. Input arrives in
+    chunks of any size: a partly filled block is convolved zero padded and
+    convolved again as the rest of it comes in, so the output never lags.
+    """
+    def __init__(self, impulse: np.ndarray, block_size: int):
+        self.block_size = block_size
+        self.fft_size = 2 * block_size
+        self.num_partitions = max(1, int(np.ceil(len(impulse) / block_size)))
+        padded = np.zeros(self.num_partitions * block_size)
+        padded[:len(impulse)] = impulse
+        self.ir_spectra = np.fft.rfft(padded.reshape(self.num_partitions, block_size),
+                                      n=self.fft_size, axis=1)
+        # Every spectrum is stored twice so the newest-first window is one slice
+        self.fdl = np.zeros((2 * self.num_partitions, block_size + 1), dtype=complex)
+        self.fdl_index = 0
+        # Previous block, then the samples of the current block so far and zeros
+        self.window = np.zeros(self.fft_size)
+        self.filled = 0
+        self.spectrum = np.zeros(block_size + 1, dtype=complex)
+        self.accumulated = np.zeros(block_size + 1, dtype=complex)
+        self.history_sum = np.zeros(block_size + 1, dtype=complex)
+        self.output = np.zeros(self.fft_size)
+
+    def process_block(self, block: np.ndarray) -> np.ndarray:
+        """Convolve the next samples, at most the rest of the current block.
+
+        The result is a view of a work buffer that the next call overwrites.
+        """
+        start, end = self.filled, self.filled + len(block)
+        if end > self.block_size:
+            raise ValueError(f"{len(block)} samples overrun the block ({self.block_size - start} left)")
+        window = self.window
+        window[self.block_size + start:self.block_size + end] = block
+        
+        # The oldest FDL slot is not part of the history, so a complete block's spectrum goes straight in
+        index = (self.fdl_index - 1) % self.num_partitions
+        if start == 0:  # The older partitions' sum stays the same until the block is complete
+            history = self.fdl[index + 1:index + self.num_partitions]
+            np.einsum('pk,pk->k', history, self.ir_spectra[1:], out=self.history_sum)
+        complete = end == self.block_size
+        spectrum = np.fft.rfft(window, out=self.fdl[index] if complete else self.spectrum)
+        np.multiply(spectrum, self.ir_spectra[0], out=self.accumulated)
+        self.accumulated += self.history_sum
+        np.fft.irfft(self.accumulated, self.fft_size, out=self.output)
+        
+        if complete:
+            self.fdl[index + self.num_partitions] = spectrum
+            self.fdl_index = index
+            window[:self.block_size] = window[self.block_size:]
+            window[self.block_size:] = 0.0
+            self.filled = 0
+        else:
+            self.filled = end
+        return self.output[self.block_size + start:self.block_size + end]
+
+    def process(self, audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Convolve a signal of any length, continuing from the previous call"""
+        output = np.empty(len(audio)) if out is None else out
+        position = 0
+        while position < len(audio):
+            end = min(len(audio), position + self.block_size - self.filled)
+            output[position:end] = self.process_block(audio[position:end])
+            position = end
+        return output
+
+class DelayLine:
+    """Circular feedback delay line whose memory persists across blocks"""
+    def __init__(self, sample_rate: int, max_delay: float = 2.0):
+        self.sample_rate = sample_rate
+        self.buffer = np.zeros(int(max_delay * sample_rate) + 1)
+        self.write_index = 0
+        self.delayed = ScratchBuffer()
+
+    def process(self, audio: np.ndarray, delay_time: float, feedback: float,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+        """y[n] = x[n] + feedback * y[n - delay], in chunks no longer than the delay"""
+        length = len(self.buffer)
+        delay = int(min(max(delay_time * self.sample_rate, 1), length - 1))
+        output = np.empty(len(audio)) if out is None else out
+        delayed = self.delayed.view(len(audio))
+        position = 0
+        while position < len(audio):
+            # Chunks also stop at the end of the ring, so reads and writes are plain slices
+            read_index = (self.write_index - delay) % length
+            chunk = min(delay, len(audio) - position, length - self.write_index, length - read_index)
+            end = position + chunk
+            np.multiply(self.buffer[read_index:read_index + chunk], feedback, out=delayed[position:end])
+            np.add(audio[position:end], delayed[position:end], out=output[position:end])
+            self.buffer[self.write_index:self.write_index + chunk] = output[position:end]
+            self.write_index = (self.write_index + chunk) % length
+            position = end
+        return output
+
+class StepSequencer:
+    """Sample-clocked step sequencer where every sequence column is its own rhythm track.
+
+    Track j steps through its column once every ``divisors[j]`` base steps, like
+    the Subharmonicon's four rhythm generators. Tick times are kept as exact
+    fractional sample positions and rounded to the nearest sample, so timing
+    never drifts with render load.
+    """
+    def __init__(self, sample_rate: int, num_tracks: int = 4):
+        self.sample_rate = sample_rate
+        self.num_tracks = num_tracks
+        self.divisors = [1] * num_tracks
+        self.track_ratios = [1.0] * num_tracks  # Pitch of each track relative to the root note
+        self.positions = [0] * num_tracks
+        self.next_tick = [0.0] * num_tracks
+        self.running = False
+        self.end_sample = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear the timing statistics"""
+        self.tick_count = [0] * self.num_tracks
+        self.last_tick = [None] * self.num_tracks
+        self.interval_sum = [0.0] * self.num_tracks
+        self.interval_min = [float('inf')] * self.num_tracks
+        self.interval_max = [0] * self.num_tracks
+        self.max_error = 0.0
+
+    def set_rhythm(self, divisors: Optional[List[int]] = None, ratios: Optional[List[float]] = None):
+        """Set each track's clock divisor and pitch ratio (before start() or on the render thread)"""
+        if divisors is not None:
+            if len(divisors) != self.num_tracks or any(int(d) != d or d < 1 for d in divisors):
+                raise ValueError(f"Need {self.num_tracks} whole divisors of at least 1, got {list(divisors)}")
+            self.divisors = [int(d) for d in divisors]
+        if ratios is not None:
+            if len(ratios) != self.num_tracks or any(r <= 0 for r in ratios):
+                raise ValueError(f"Need {self.num_tracks} positive pitch ratios, got {list(ratios)}")
+            self.track_ratios = [float(r) for r in ratios]
+
+    def start(self, sample: int):
+        """Start every track from step 0 at the given sample"""
+        self.running = True
+        self.positions = [0] * self.num_tracks
+        self.next_tick = [float(sample)] * self.num_tracks
+        self.last_tick = [None] * self.num_tracks
+
+    def stop(self):
+        """Stop generating triggers"""
+        self.running = False
+
+    def record_tick(self, track: int, sample: int, exact: float):
+        """Accumulate interval and rounding statistics for one tick"""
+        self.tick_count[track] += 1
+        self.max_error = max(self.max_error, abs(sample - exact))
+        if self.last_tick[track] is not None:
+            interval = sample - self.last_tick[track]
+            self.interval_sum[track] += interval
+            self.interval_min[track] = min(self.interval_min[track], interval)
+            self.interval_max[track] = max(self.interval_max[track], interval)
+        self.last_tick[track] = sample
+
+    def events(self, block_start: int, frames: int, sequence: np.ndarray, step_duration: float,
+               root_frequency: float) -> List[Tuple[int, float, float]]:
+        """Collect (offset, frequency, velocity) triggers that fall inside this block.
+
+        Tracks hitting the same pitch on the same sample merge into one note.
+        """
+        block_end = block_start + frames
+        if self.end_sample is not None:
+            block_end = min(block_end, self.end_sample)
+        triggers = {}
+        for track in range(self.num_tracks):
+            while True:
+                exact = self.next_tick[track]
+                sample = int(round(exact))
+                if sample >= block_end:
+                    break
+                self.record_tick(track, sample, exact)
+                value = sequence[self.positions[track] % len(sequence), track]
+                if value:
+                    key = (sample - block_start, root_frequency * self.track_ratios[track])
+                    triggers[key] = max(triggers.get(key, 0.0), min(abs(float(value)), 1.0))
+                self.positions[track] = (self.positions[track] + 1) % len(sequence)
+                self.next_tick[track] += step_duration * self.divisors[track] * self.sample_rate
+        return sorted((offset, frequency, velocity) for (offset, frequency), velocity in triggers.items())
+
+    def timing_stats(self) -> Dict[str, object]:
+        """Per-track step interval statistics in samples, plus worst rounding error.
+
+        Ticks land on exact samples, so how steadily they are heard depends only
+        on the output callbacks; AudioEngine.timing_stats() reports that jitter.
+        """
+        tracks = []
+        for track in range(self.num_tracks):
+            intervals = self.tick_count[track] - 1
+            if intervals > 0:
+                tracks.append({'ticks': self.tick_count[track],
+                               'mean_interval': self.interval_sum[track] / intervals,
+                               'min_interval': self.interval_min[track],
+                               'max_interval': self.interval_max[track]})
+            else:
+                tracks.append({'ticks': self.tick_count[track]})
+        return {'tracks': tracks, 'max_error_samples': self.max_error}
+
+class ParameterQueue:
+    """Bounded single-producer/single-consumer queue of control events.
+
+    Slots are preallocated. The control thread only advances ``tail`` and the
+    render thread only advances ``head``, so neither side ever takes a lock.
+    """
+    NOTE, SET, WAVEFORM, SEQUENCE, RECORD = range(5)
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.kinds = [0] * capacity
+        self.targets = [0] * capacity
+        self.values = [0.0] * capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def push(self, kind: int, target: int, value: float) -> bool:
+        """Enqueue an event from the control thread, returns False when full"""
+        if self.tail - self.head >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = self.tail % self.capacity
+        self.kinds[slot] = kind
+        self.targets[slot] = target
+        self.values[slot] = value
+        self.tail += 1  # Publish only after the slot is fully written
+        return True
+
+    def pop(self) -> Optional[Tuple[int, int, float]]:
+        """Dequeue the oldest event on the render thread, or None if empty"""
+        if self.head == self.tail:
+            return None
+        slot = self.head % self.capacity
+        event = (self.kinds[slot], self.targets[slot], self.values[slot])
+        self.head += 1
+        return event
+
+def midi_note_frequency(note: int) -> float:
+    """Equal-tempered frequency of a MIDI note number (69 = A4 = 440 Hz)"""
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+@dataclass
+class MidiEvent:
+    time: float  # Seconds from the start of the source
+    kind: str    # 'note_on' or 'note_off'
+    note: int
+    velocity: int
+    channel: int = 0
+
+class MidiSource(ABC):
+    """Something that feeds timestamped MIDI events into the render loop.
+
+    The render thread calls ``pending`` once per block and gets back the events
+    that fall inside it as (sample, event) pairs on the synth's sample clock.
+    """
+    @abstractmethod
+    def pending(self, block_start: int, frames: int) -> List[Tuple[int, MidiEvent]]:
+        pass
+
+class MidiFile:
+    """Standard MIDI File (format 0 or 1) reduced to note events with absolute times.
+
+    Running status, SMPTE time division and mid-file tempo changes are handled;
+    meta, sysex and non-note channel messages are skipped.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != b'MThd':
+            raise ValueError(f"Not a Standard MIDI File: {path}")
+        header_length = int.from_bytes(data[4:8], 'big')
+        self.format = int.from_bytes(data[8:10], 'big')
+        num_tracks = int.from_bytes(data[10:12], 'big')
+        division = int.from_bytes(data[12:14], 'big')
+        
+        # (tick, track, order, tempo or None, kind, channel, note, velocity)
+        raw = []
+        position = 8 + header_length
+        for track in range(num_tracks):
+            if data[position:position + 4] != b'MTrk':
+                raise ValueError(f"Missing track chunk {track} in {path}")
+            length = int.from_bytes(data[position + 4:position + 8], 'big')
+            self.parse_track(data[position + 8:position + 8 + length], track, raw)
+            position += 8 + length
+        raw.sort(key=lambda item: item[:3])
+        
+        if division & 0x8000:  # SMPTE: frames per second and ticks per frame
+            fps = 256 - (division >> 8)
+            tick_seconds = lambda tempo: 1.0 / (fps * (division & 0xFF))
+        else:
+            tick_seconds = lambda tempo: tempo / 1e6 / division
+        self.events = []
+        tempo = 500000  # Microseconds per quarter note until the first tempo event
+        seconds = 0.0
+        last_tick = 0
+        for tick, _, _, new_tempo, kind, channel, note, velocity in raw:
+            seconds += (tick - last_tick) * tick_seconds(tempo)
+            last_tick = tick
+            if new_tempo is not None:
+                tempo = new_tempo
+            else:
+                self.events.append(MidiEvent(seconds, kind, note, velocity, channel))
+        self.duration = seconds
+
+    @staticmethod
+    def read_varlen(data: bytes, position: int) -> Tuple[int, int]:
+        """Decode a variable-length quantity, returning (value, next position)"""
+        value = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value = (value << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                return value, position
+
+    def parse_track(self, data: bytes, track: int, raw: list):
+        """Append the tempo and note events of one track chunk to raw"""
+        position = 0
+        tick = 0
+        status = 0
+        while position < len(data):
+            delta, position = self.read_varlen(data, position)
+            tick += delta
+            if data[position] & 0x80:
+                status = data[position]
+                position += 1
+            if status == 0xFF:  # Meta event
+                meta_type = data[position]
+                length, position = self.read_varlen(data, position + 1)
+                if meta_type == 0x51 and length == 3:
+                    tempo = int.from_bytes(data[position:position + 3], 'big')
+                    raw.append((tick, track, len(raw), tempo, None, 0, 0, 0))
+                elif meta_type == 0x2F:
+                    break
+                position += length
+                status = 0
+            elif status in (0xF0, 0xF7):  # Sysex
+                length, position = self.read_varlen(data, position)
+                position += length
+                status = 0
+            elif status:
+                kind = status & 0xF0
+                size = 1 if kind in (0xC0, 0xD0) else 2
+                if kind in (0x80, 0x90):
+                    note, velocity = data[position], data[position + 1]
+                    name = 'note_on' if kind == 0x90 and velocity > 0 else 'note_off'
+                    raw.append((tick, track, len(raw), None, name, status & 0x0F, note, velocity))
+                position += size
+            else:
+                raise ValueError(f"Data byte without running status at offset {position}")
+
+    def note_count(self) -> int:
+        """Number of note-on events"""
+        return sum(1 for event in self.events if event.kind == 'note_on')
+
+class MidiFileSource(MidiSource):
+    """Plays a MidiFile with every event on its exact sample"""
+    def __init__(self, midi_file: MidiFile, sample_rate: int, start_sample: int = 0):
+        self.events = midi_file.events
+        self.samples = [start_sample + int(round(event.time * sample_rate)) for event in self.events]
+        self.cursor = 0
+
+    def pending(self, block_start: int, frames: int) -> List[Tuple[int, MidiEvent]]:
+        """Events up to the end of this block; late ones are clamped to its first sample"""
+        due = []
+        block_end = block_start + frames
+        while self.cursor < len(self.events) and self.samples[self.cursor] < block_end:
+            due.append((max(self.samples[self.cursor], block_start), self.events[self.cursor]))
+            self.cursor += 1
+        return due
+
+class MidiPortSource(MidiSource):
+    """Live MIDI input through mido, timestamped on arrival.
+
+    The backend callback thread only writes into a preallocated ring. ``clock``
+    returns the AudioEngine's event clock, which maps arrival times onto the
+    sample clock of the output stream. Every note then sounds the same latency
+    (the ring plus one block) after it arrived, however the render thread
+    bursts; only the output callback's own jitter remains. Without a clock (no
+    stream running) events play at the start of the next block.
+    """
+    def __init__(self, sample_rate: int, port_name: Optional[str] = None, capacity: int = 256,
+                 clock: Optional[Callable[[], Optional[Tuple[float, int]]]] = None):
+        if mido is None:
+            raise RuntimeError("Live MIDI input needs the 'mido' package and a backend such as python-rtmidi")
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.clock = clock
+        self.times = [0.0] * capacity
+        self.events = [None] * capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.port = mido.open_input(port_name, callback=self.receive)
+
+    def receive(self, message):
+        """Backend callback: stamp and enqueue note messages"""
+        now = time.perf_counter()
+        if message.type not in ('note_on', 'note_off'):
+            return
+        if self.tail - self.head >= self.capacity:
+            self.dropped += 1
+            return
+        slot = self.tail % self.capacity
+        kind = 'note_on' if message.type == 'note_on' and message.velocity > 0 else 'note_off'
+        self.times[slot] = now
+        self.events[slot] = MidiEvent(now - self.started, kind, message.note, message.velocity, message.channel)
+        self.tail += 1  # Publish only after the slot is fully written
+
+    def pending(self, block_start: int, frames: int) -> List[Tuple[int, MidiEvent]]:
+        """Events whose output sample falls before the end of this block; later ones stay queued"""
+        clock = self.clock() if self.clock is not None else None
+        block_end = block_start + frames
+        due = []
+        while self.head != self.tail:
+            slot = self.head % self.capacity
+            if clock is None:
+                sample = block_start
+            else:
+                clock_time, clock_sample = clock
+                sample = clock_sample + int(round((self.times[slot] - clock_time) * self.sample_rate))
+                if sample >= block_end:
+                    break
+            due.append((max(sample, block_start), self.events[slot]))
+            self.head += 1
+        return due
+
+    def close(self):
+        self.port.close()
+
+@lru_cache(maxsize=16)
+def oversampling_filter(factor: int, taps: int) -> np.ndarray:
+    """Anti-imaging/anti-aliasing low-pass for the given oversampling factor"""
+    return signal.firwin(taps, 0.9 / factor)
+
+class Oversampler:
+    """Streaming polyphase up/down-sampler.
+
+    Both directions are a single matrix product over sliding windows of the
+    input, with the previous block's tail kept as history.
+    """
+    def __init__(self, factor: int, taps: int):
+        self.factor = factor
+        self.taps = taps
+        h = oversampling_filter(factor, taps)
+        # polyphase[M-1-m, k] = h[m*factor + k]
+        self.polyphase = h.reshape(taps // factor, factor)[::-1] * factor
+        self.reversed = h[::-1].copy()
+        self.up_history = np.zeros(taps // factor - 1)
+        self.down_history = np.zeros(taps - 1)
+        self.up_input = ScratchBuffer()
+        self.up_output = ScratchBuffer()
+        self.down_input = ScratchBuffer()
+
+    def upsample(self, audio: np.ndarray) -> np.ndarray:
+        """factor * len(audio) samples at the high rate, in a buffer the next call reuses"""
+        n, h = len(audio), len(self.up_history)
+        extended = self.up_input.view(h + n)
+        extended[:h] = self.up_history
+        extended[h:] = audio
+        self.up_history[:] = extended[n:]
+        windows = np.lib.stride_tricks.sliding_window_view(extended, len(self.polyphase))
+        return np.matmul(windows, self.polyphase, out=self.up_output.view(n, self.factor)).reshape(-1)
+
+    def downsample(self, audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Filter and keep every factor-th sample"""
+        n, h = len(audio), len(self.down_history)
+        extended = self.down_input.view(h + n)
+        extended[:h] = self.down_history
+        extended[h:] = audio
+        self.down_history[:] = extended[n:]
+        windows = np.lib.stride_tricks.sliding_window_view(extended, self.taps)
+        out = np.empty(n // self.factor) if out is None else out
+        return np.matmul(windows[self.factor - 1::self.factor], self.reversed, out=out)
+
+class Saturator:
+    """tanh soft clipper with a quality/CPU knob.
+
+    'realtime' clips at the base rate; 'high' and 'offline' run the curve
+    inside a 2x or 4x polyphase oversampler so its harmonics don't fold back.
+    """
+    QUALITY = {'realtime': (1, 0), 'high': (2, 32), 'offline': (4, 96)}
+
+    def __init__(self, quality: str = 'realtime', drive: float = 1.0):
+        self.drive = drive
+        self.set_quality(quality)
+
+    def set_quality(self, quality: str):
+        """Switch quality; the oversampler starts from silence"""
+        factor, taps = self.QUALITY[quality]
+        self.quality = quality
+        self.oversampler = Oversampler(factor, taps) if factor > 1 else None
+
+    def process(self, audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Soft clip one block into out, which may be audio itself"""
+        out = np.empty_like(audio) if out is None else out
+        if self.oversampler is None:
+            np.multiply(audio, self.drive, out=out)
+            return np.tanh(out, out=out)
+        upsampled = self.oversampler.upsample(audio)
+        upsampled *= self.drive
+        np.tanh(upsampled, out=upsampled)
+        return self.oversampler.downsample(upsampled, out=out)
+
+class BlockRingBuffer:
+    """Single-producer/single-consumer ring of preallocated audio blocks.
+
+    The render thread only advances ``write_index`` and the audio callback only
+    advances ``read_index``, so no lock is needed between them.
+    """
+    def __init__(self, num_blocks: int, block_size: int):
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        self.blocks = np.zeros((num_blocks, block_size), dtype=np.float32)
+        self.write_index = 0
+        self.read_index = 0
+
+    def available(self) -> int:
+        """Number of rendered blocks waiting to be played"""
+        return self.write_index - self.read_index
+
+    def write_block(self) -> Optional[np.ndarray]:
+        """Return the next free block slot, or None if the ring is full"""
+        if self.available() >= self.num_blocks:
+            return None
+        return self.blocks[self.write_index % self.num_blocks]
+
+    def commit(self):
+        """Publish the block returned by write_block to the reader"""
+        self.write_index += 1
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """Copy the oldest rendered block into out, returns False on underrun"""
+        if self.available() <= 0:
+            return False
+        np.copyto(out, self.blocks[self.read_index % self.num_blocks])
+        self.read_index += 1
+        return True
+
+class NullOutputStream:
+    """Drop-in for sd.OutputStream that drives the callback without a sound card"""
+    def __init__(self, samplerate: int, blocksize: int, channels: int, dtype: str,
+                 callback, realtime: bool = True):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.realtime = realtime
+        self.frames_played = 0
+        self.active = False
+        self.thread = None
+
+    def _run(self):
+        outdata = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        block_time = self.blocksize / self.samplerate
+        next_deadline = time.perf_counter()
+        while self.active:
+            self.callback(outdata, self.blocksize, None, None)
+            self.frames_played += self.blocksize
+            if self.realtime:
+                next_deadline += block_time
+                delay = next_deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start(self):
+        self.active = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.active = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def close(self):
+        self.stop()
+
+class AudioEngine:
+    """Persistent output stream fed by a render thread through a block ring buffer"""
+    def __init__(self, synth: 'ModernSubharmonicon', backend: str = 'sounddevice',
+                 num_blocks: int = 3, realtime: bool = True):
+        # realtime=False only makes sense with the null backend: blocks are then
+        # rendered on demand inside the callback, as fast as the CPU allows
+        self.synth = synth
+        self.backend = backend
+        self.block_size = synth.buffer_size
+        self.ring = BlockRingBuffer(num_blocks, self.block_size)
+        self.realtime = realtime
+        self.underruns = 0
+        self.blocks_rendered = 0
+        self.last_callback = None
+        self.callback_count = 0
+        self.max_callback_jitter = 0.0
+        self.samples_played = 0
+        self.event_clock = None
+        self.running = False
+        self.stream = None
+        self.render_thread = None
+
+    def audio_callback(self, outdata, frames, time_info, status):
+        """Output stream callback, only copies an already rendered block"""
+        now = time.perf_counter()
+        if self.last_callback is not None:
+            jitter = abs(now - self.last_callback - frames / self.synth.sample_rate)
+            self.max_callback_jitter = max(self.max_callback_jitter, jitter)
+        self.last_callback = now
+        self.callback_count += 1
+        if not self.realtime and self.ring.available() == 0:
+            self.render_pending()  # Offline pacing: render on demand
+        if self.ring.read_into(outdata[:, 0]):
+            # The render thread refills the freed slot straight away, so the first
+            # block an event arriving now can still reach lies a full ring beyond it
+            self.event_clock = (now, self.samples_played + (self.ring.num_blocks + 1) * self.block_size)
+            self.samples_played += frames
+        else:
+            outdata.fill(0)
+            self.underruns += 1
+
+    def render_pending(self) -> int:
+        """Fill every free ring slot with freshly rendered audio"""
+        rendered = 0
+        block = self.ring.write_block()
+        while block is not None:
+            block[:] = self.synth.render_block(self.block_size)
+            self.ring.commit()
+            self.blocks_rendered += 1
+            rendered += 1
+            block = self.ring.write_block()
+        return rendered
+
+    def render_loop(self):
+        """Keep the ring buffer topped up while the engine is running"""
+        idle_sleep = self.block_size / self.synth.sample_rate / 4
+        while self.running:
+            try:
+                if self.render_pending() == 0 and self.realtime:
+                    time.sleep(idle_sleep)
+            except Exception as e:
+                print(f"Audio render error: {e}")
+
+    def timing_stats(self) -> Dict[str, object]:
+        """Callback and sequencer timing, to check behaviour under load"""
+        return {'callbacks': self.callback_count, 'underruns': self.underruns,
+                'max_callback_jitter_ms': self.max_callback_jitter * 1000,
+                'sequencer': self.synth.sequencer.timing_stats()}
+
+    def start(self):
+        """Open the output stream and start rendering"""
+        if self.backend == 'null' or sd is None:
+            stream_class = lambda **kwargs: NullOutputStream(realtime=self.realtime, **kwargs)
+        else:
+            stream_class = sd.OutputStream
+        self.stream = stream_class(samplerate=self.synth.sample_rate, blocksize=self.block_size,
+                                   channels=1, dtype='float32', callback=self.audio_callback)
+        self.running = True
+        self.samples_played = self.synth.sample_clock
+        self.render_pending()
+        if self.realtime:
+            self.render_thread = threading.Thread(target=self.render_loop, daemon=True)
+            self.render_thread.start()
+        self.stream.start()
+
+    def stop(self):
+        """Stop rendering and close the output stream"""
+        self.running = False
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if self.render_thread is not None:
+            self.render_thread.join()
+            self.render_thread = None
+
+class WavWriter:
+    """Streams mono audio to a 16-bit PCM WAV file chunk by chunk"""
+    def __init__(self, path: str, sample_rate: int):
+        self.wav = wave.open(path, 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(sample_rate)
+
+    def write(self, audio: np.ndarray):
+        pcm = (np.clip(audio, -1, 1) * 32767).astype('<i2')
+        self.wav.writeframes(pcm.tobytes())
+
+    def close(self):
+        self.wav.close()
+
+class NpyWriter:
+    """Streams float32 audio into a memory-mapped .npy file of known length"""
+    def __init__(self, path: str, total_samples: int):
+        self.array = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(total_samples,))
+        self.position = 0
+
+    def write(self, audio: np.ndarray):
+        self.array[self.position:self.position + len(audio)] = audio
+        self.position += len(audio)
+
+    def close(self):
+        self.array.flush()
+        del self.array
+
+class OfflineRenderer:
+    """Renders note lists or step sequences straight to disk, as fast as the CPU allows.
+
+    Notes are (start_seconds, frequency, duration_seconds, velocity) tuples and
+    start on their exact sample.
+    Audio is written every ``chunk_blocks`` blocks, so memory use does not
+    grow with the length of the render.
+    """
+    def __init__(self, synth: 'ModernSubharmonicon', chunk_blocks: int = 64):
+        self.synth = synth
+        self.chunk_blocks = chunk_blocks
+        self.realtime_factor = 0.0
+        self.worst_block_seconds = 0.0
+
+    def render(self, notes: List[Tuple[float, float, float, float]], path: str,
+               tail: float = 1.0, duration: float = 0.0) -> int:
+        """Render notes to a .wav or .npy file and return the number of samples written"""
+        synth = self.synth
+        block_size = synth.buffer_size
+        end_time = max([duration] + [start + length for start, _, length, _ in notes]) + tail
+        num_blocks = int(np.ceil(end_time * synth.sample_rate / block_size))
+        total_samples = num_blocks * block_size
+        
+        for start, frequency, length, velocity in notes:
+            synth.schedule_note(synth.sample_clock + int(round(start * synth.sample_rate)),
+                                frequency, length, velocity)
+        if path.endswith('.npy'):
+            writer = NpyWriter(path, total_samples)
+        else:
+            writer = WavWriter(path, synth.sample_rate)
+            
+        chunk = np.zeros(self.chunk_blocks * block_size, dtype=np.float32)
+        filled = 0
+        self.worst_block_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            for _ in range(num_blocks):
+                block_started = time.perf_counter()
+                chunk[filled:filled + block_size] = synth.render_block(block_size)
+                self.worst_block_seconds = max(self.worst_block_seconds, time.perf_counter() - block_started)
+                filled += block_size
+                if filled == len(chunk):
+                    writer.write(chunk)
+                    filled = 0
+            if filled:
+                writer.write(chunk[:filled])
+        finally:
+            writer.close()
+            
+        elapsed = time.perf_counter() - started
+        self.realtime_factor = total_samples / synth.sample_rate / max(elapsed, 1e-9)
+        return total_samples
+
+    def render_into(self, notes: List[Tuple[float, float, float, float]], out: np.ndarray):
+        """Render notes straight into a preallocated array, block by block"""
+        synth = self.synth
+        block_size = synth.buffer_size
+        for start, frequency, length, velocity in notes:
+            synth.schedule_note(synth.sample_clock + int(round(start * synth.sample_rate)),
+                                frequency, length, velocity)
+        for position in range(0, len(out), block_size):
+            block = synth.render_block(block_size)
+            out[position:position + block_size] = block[:len(out) - position]
+
+    def render_sequence(self, path: str, sequence: Optional[np.ndarray] = None,
+                        repeats: int = 1, tail: float = 1.0) -> int:
+        """Render a (steps, 4) sequence matrix through the sample-accurate sequencer.
+
+        ``repeats`` counts passes of the slowest track (the largest divisor).
+        """
+        synth = self.synth
+        if sequence is not None:
+            synth.sequence = sequence
+        duration = repeats * len(synth.sequence) * synth.step_duration * max(synth.sequencer.divisors)
+        synth.sequencer.end_sample = synth.sample_clock + int(round(duration * synth.sample_rate))
+        synth.sequence_playing = True
+        try:
+            return self.render([], path, tail, duration)
+        finally:
+            synth.sequence_playing = False
+            synth.sequencer.end_sample = None
+
+    def render_midi(self, midi_file: MidiFile, path: str, tail: float = 1.0) -> int:
+        """Replay a MIDI file through the synth's MIDI input path, e.g. to stress voice allocation"""
+        synth = self.synth
+        source = MidiFileSource(midi_file, synth.sample_rate, synth.sample_clock)
+        synth.add_midi_source(source)
+        try:
+            return self.render([], path, tail, midi_file.duration)
+        finally:
+            synth.midi_sources.remove(source)
+
+def render_patch_worker(shm_name: str, shape: Tuple[int, int], index: int, patch: Dict[str, object],
+                        notes: List[Tuple[float, float, float, float]], sample_rate: int) -> int:
+    """Process-pool task: render one patch into its row of the shared output buffer"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        synth = ModernSubharmonicon(sample_rate)
+        synth.apply_patch(patch)
+        OfflineRenderer(synth).render_into(notes, output[index])
+        del output  # Release the view before closing the mapping
+    finally:
+        shm.close()
+    return index
+
+class BatchRenderer:
+    """Renders many patch variations in parallel across a process pool.
+
+    Every worker writes its patch straight into one shared-memory
+    (patches, samples) float32 buffer, so only the patch dict and the row
+    index cross the process boundary.
+    """
+    DEFAULT_NOTES = [(0.0, 130.81, 1.0, 1.0), (0.0, 164.81, 1.0, 0.8), (0.0, 196.00, 1.0, 0.8)]
+
+    def __init__(self, sample_rate: int = 44100, max_workers: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.max_workers = max_workers
+
+    @staticmethod
+    def patch_grid(**axes) -> List[Dict[str, object]]:
+        """Cartesian product of parameter values, e.g. patch_grid(waveform=[...], filter_cutoff=[...])"""
+        names = list(axes)
+        return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+    def render(self, patches: List[Dict[str, object]],
+               notes: Optional[List[Tuple[float, float, float, float]]] = None,
+               seconds: float = 2.0) -> np.ndarray:
+        """Render every patch for the given notes and return a (patches, samples) array"""
+        notes = self.DEFAULT_NOTES if notes is None else notes
+        shape = (len(patches), int(seconds * self.sample_rate))
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 4))
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(render_patch_worker, shm.name, shape, index, patch,
+                                           notes, self.sample_rate)
+                           for index, patch in enumerate(patches)]
+                for future in futures:
+                    future.result()
+            output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return output
+
+class SynthBenchmark:
+    """Headless DSP benchmark over every waveform and cycle_effects combination.
+
+    Stages are timed by wrapping the synth's own methods on the instance, so the
+    normal render path carries no instrumentation.
+    """
+    EFFECTS = {'none': (2000.0, 0.0), 'filter': (800.0, 0.0),
+               'reverb': (2000.0, 0.3), 'filter+reverb': (800.0, 0.3)}
+
+    def __init__(self, seconds: float = 5.0, held_notes: int = 8, sample_rate: int = 44100):
+        self.seconds = seconds
+        self.held_notes = held_notes
+        self.sample_rate = sample_rate
+
+    def timed(self, function, stage: str, timings: Dict[str, List[float]]):
+        """Wrap a callable so every call adds its duration to timings[stage]"""
+        samples = timings.setdefault(stage, [])
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = function(*args, **kwargs)
+            samples.append(time.perf_counter() - started)
+            return result
+        return wrapper
+
+    def make_synth(self, waveform: str, effect: str) -> 'ModernSubharmonicon':
+        """Synth with the scenario's settings, a held chord and the default sequence playing"""
+        synth = ModernSubharmonicon(self.sample_rate)
+        for osc in synth.oscillators:
+            osc.waveform = waveform
+        synth.filter_cutoff, synth.reverb_amount = self.EFFECTS[effect]
+        synth.load_default_sequence()
+        synth.sequence_playing = True
+        for i in range(self.held_notes):
+            synth.trigger_note(130.81 * 2 ** (i * 4 / 12), duration=self.seconds + 1.0)
+        return synth
+
+    def run_scenario(self, waveform: str, effect: str) -> Dict[str, object]:
+        """Render self.seconds of audio and collect timing and allocation figures"""
+        synth = self.make_synth(waveform, effect)
+        block_size = synth.buffer_size
+        num_blocks = max(1, int(self.seconds * self.sample_rate / block_size))
+        
+        timings = {}
+        synth.voices.render = self.timed(synth.voices.render, 'voice_render', timings)
+        synth.apply_filter = self.timed(synth.apply_filter, 'apply_filter', timings)
+        synth.apply_effects = self.timed(synth.apply_effects, 'apply_effects', timings)
+        synth.reverb.process = self.timed(synth.reverb.process, 'reverb', timings)
+        synth.delay_line.process = self.timed(synth.delay_line.process, 'delay', timings)
+        
+        block_times = np.zeros(num_blocks)
+        for i in range(num_blocks):
+            started = time.perf_counter()
+            synth.render_block(block_size)
+            block_times[i] = time.perf_counter() - started
+            
+        # Stages run once per block except voice_render, which splits at note triggers
+        stages_us = {stage: float(np.sum(values) / num_blocks * 1e6) for stage, values in timings.items()}
+        
+        # Allocation pass on a few steady-state blocks; tracemalloc slows rendering
+        peaks = self.block_peaks(synth, min(num_blocks, 16))
+        
+        block_seconds = block_size / self.sample_rate
+        return {
+            'waveform': waveform,
+            'effects': effect,
+            'blocks': num_blocks,
+            'realtime_factor': float(num_blocks * block_seconds / block_times.sum()),
+            'mean_block_us': float(block_times.mean() * 1e6),
+            'worst_block_us': float(block_times.max() * 1e6),
+            'stages_us_per_block': stages_us,
+            'alloc_bytes_per_block': float(peaks.mean()),
+            'max_alloc_bytes_per_block': float(peaks.max()),
+        }
+
+    def block_peaks(self, synth: 'ModernSubharmonicon', blocks: int) -> np.ndarray:
+        """Peak traced memory growth in bytes while rendering each of the next blocks"""
+        peaks = np.zeros(blocks)
+        tracemalloc.start()
+        for i in range(blocks):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            synth.render_block(synth.buffer_size)
+            peaks[i] = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        return peaks
+
+    def check_allocations(self, warmup_blocks: int = 8, blocks: int = 32,
+                          limit: int = 4096) -> Dict[str, object]:
+        """Check that steady-state blocks allocate no audio buffers, for every scenario.
+
+        tracemalloc also sees interpreter objects (array views, floats, event
+        tuples) that live only for the duration of a call, so the check is that
+        the traced peak per block stays under ``limit`` bytes, half of a single
+        1024-sample float64 buffer. Warm-up blocks let the work buffers and the
+        filter kernel cache reach their final size first.
+        """
+        scenarios = []
+        for waveform in WavetableBank.WAVEFORMS:
+            for effect in self.EFFECTS:
+                synth = self.make_synth(waveform, effect)
+                for _ in range(warmup_blocks):
+                    synth.render_block(synth.buffer_size)
+                peaks = self.block_peaks(synth, blocks)
+                scenarios.append({'waveform': waveform, 'effects': effect,
+                                  'max_alloc_bytes_per_block': float(peaks.max())})
+        worst = max(scenario['max_alloc_bytes_per_block'] for scenario in scenarios)
+        return {'limit_bytes': limit, 'worst_bytes_per_block': worst,
+                'passed': worst < limit, 'scenarios': scenarios}
+
+    def check_convolver(self, chunk_sizes: Tuple[int, ...] = (4410, 1, 1023, 1024, 300, 2049, 7),
+                        seconds: float = 1.0) -> Dict[str, object]:
+        """Check the reverb's PartitionedConvolver against np.convolve when fed chunks of uneven sizes"""
+        rng = np.random.default_rng(0)
+        audio = rng.standard_normal(int(seconds * self.sample_rate))
+        synth = ModernSubharmonicon(self.sample_rate)
+        impulse = synth.reverb_impulse()
+        convolver = PartitionedConvolver(impulse, synth.buffer_size)
+        output = np.empty_like(audio)
+        position, chunk = 0, 0
+        while position < len(audio):
+            end = min(len(audio), position + chunk_sizes[chunk % len(chunk_sizes)])
+            convolver.process(audio[position:end], output[position:end])
+            position, chunk = end, chunk + 1
+        expected = np.convolve(audio, impulse)[:len(audio)]
+        error = float(np.max(np.abs(output - expected)))
+        tolerance = 1e-9 * float(np.max(np.abs(expected)))
+        return {'chunks': chunk, 'max_error': error, 'tolerance': tolerance, 'passed': error <= tolerance}
+
+    def run_modulation(self, routing_counts: Tuple[int, ...] = (0, 8, 16, 32, 64)) -> Dict[str, object]:
+        """Cost of the modulation matrix as the number of routings grows"""
+        rng = np.random.default_rng(0)
+        results = []
+        for count in routing_counts:
+            synth = self.make_synth('saw', 'filter')
+            for i in range(count):
+                synth.add_modulation(ModulationParams(
+                    amount=float(rng.uniform(0.05, 0.5)), rate=float(rng.uniform(0.1, 8.0)),
+                    shape=ModulationMatrix.SHAPES[i % len(ModulationMatrix.SHAPES)],
+                    destination=ModulationMatrix.DESTINATIONS[i % len(ModulationMatrix.DESTINATIONS)]))
+            timings = {}
+            synth.modulation.process = self.timed(synth.modulation.process, 'matrix', timings)
+            num_blocks = max(1, int(self.seconds * self.sample_rate / synth.buffer_size))
+            started = time.perf_counter()
+            for _ in range(num_blocks):
+                synth.render_block(synth.buffer_size)
+            results.append({'routings': count,
+                            'block_us': (time.perf_counter() - started) / num_blocks * 1e6,
+                            'matrix_us': float(np.mean(timings['matrix']) * 1e6)})
+        # Least-squares slope of block time against routing count
+        counts = np.array([r['routings'] for r in results], dtype=float)
+        block_us = np.array([r['block_us'] for r in results])
+        slope = float(np.polyfit(counts, block_us, 1)[0]) if len(results) > 1 else 0.0
+        return {'points': results, 'us_per_routing': slope}
+
+    def run(self) -> Dict[str, object]:
+        """Run every scenario and return a JSON-serialisable report"""
+        scenarios = [self.run_scenario(waveform, effect)
+                     for waveform in WavetableBank.WAVEFORMS for effect in self.EFFECTS]
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'sample_rate': self.sample_rate,
+            'seconds': self.seconds,
+            'held_notes': self.held_notes,
+            'scenarios': scenarios,
+            'modulation': self.run_modulation(),
+        }
+
 class ModernSubharmonicon:
-    def __init__(self, sample_rate: int = 44100):
+    # Parameters the control thread may change, with their glide times in seconds
+    PARAMETERS = ['filter_cutoff', 'filter_resonance', 'reverb_amount', 'delay_time', 'delay_feedback']
+    SMOOTHING_TIMES = {'filter_cutoff': 0.05, 'filter_resonance': 0.05, 'reverb_amount': 0.05,
+                       'delay_time': 0.2, 'delay_feedback': 0.05}
+    # Values sent from the control thread are clamped into these ranges
+    PARAMETER_RANGES = {'filter_cutoff': (20.0, 18000.0), 'filter_resonance': (0.1, 10.0),
+                        'reverb_amount': (0.0, 1.0), 'delay_time': (0.0, 2.0), 'delay_feedback': (0.0, 0.99)}
+    MIDI_HOLD = 600.0  # Gate in seconds for MIDI notes, which normally end on their note-off
+    
+    def __init__(self, sample_rate: int = 44100, polyphony: int = 32):
         # Audio parameters
         self.sample_rate = sample_rate
         self.buffer_size = 1024
-        self.audio_queue = queue.Queue(maxsize=64)
+        self.event_queue = ParameterQueue(64)
+        self.engine = None
+        self.wavetables = WavetableBank(sample_rate)
+        self.filter = StreamingFilter(sample_rate)
+        self.delay_line = DelayLine(sample_rate)
+        self.saturator = Saturator()
+        self.block_buffer = ScratchBuffer(self.buffer_size)
+        self.wet_buffer = ScratchBuffer(self.buffer_size)
         
         # Synth state
-        self.is_playing = False
         self.is_recording = False
-        self.recording_buffer = []
+        self.recording_path = None
+        self.recorder: Optional[WavWriter] = None
         
         # Oscillator setup
         self.oscillators = [
-            OscillatorParams(440.0, 'saw', 0.4, 0.0, [0.3, 0.3]),
-            OscillatorParams(440.0, 'saw', 0.4, 0.0, [0.3, 0.3])
+            OscillatorParams(440.0, 'saw', 0.4, [0.3, 0.3]),
+            OscillatorParams(440.0, 'saw', 0.4, [0.3, 0.3], ratio=1.5)  # Fifth above
         ]
+        self.note_duration = 0.1
+        self.root_frequency = 440.0  # Last keyboard or MIDI note; the sequencer plays relative to it
+        self.voices = VoicePool(polyphony, 3 * len(self.oscillators), sample_rate)
+        self.voices.reserve(self.buffer_size)
+        self.wavetables.reserve(polyphony * self.voices.rows_per_voice, self.buffer_size)
+        self.sample_clock = 0
         
         # Effects parameters
         self.filter_cutoff = 2000.0
         self.filter_resonance = 1.0
         self.reverb_amount = 0.2
+        self.reverb_time = 0.1
+        self.reverb = PartitionedConvolver(self.reverb_impulse(), self.buffer_size)
         self.delay_time = 0.25
         self.delay_feedback = 0.3
         
         # Sequencer
         self.sequence_length = 16
         self.step_duration = 0.25
-        self.current_step = 0
+        self.sequencer = StepSequencer(sample_rate)
+        self.scheduled_notes = []
+        self.schedule_counter = 0
+        self.midi_sources = []
         self.sequence = np.zeros((self.sequence_length, 4))
         self.sequence_playing = False
         
+        # Control-thread view of the parameters; the render thread owns the real ones
+        self.control_values = {name: getattr(self, name) for name in self.PARAMETERS}
+        self.control_values['waveform'] = self.oscillators[0].waveform
+        self.control_values['sequence_playing'] = False
+        self.control_values['recording'] = False
+        self.gliding = {}
+        
         # Keyboard mapping
         self.setup_keyboard_mapping()
         
         # Modulation
         self.modulations = []
-        self.lfo_phase = 0.0
+        self.modulation = ModulationMatrix(sample_rate)
         
     def setup_keyboard_mapping(self):
         """Set up musical keyboard mapping and controls"""
@@ -87,59 +1732,58 @@ class ModernSubharmonicon:
             'right': lambda: self.adjust_parameter('reverb_amount', 0.1)
         }
         
-    def generate_waveform(self, frequency: float, waveform: str, phase: float = 0.0) -> np.ndarray:
-        """Generate a single cycle of the specified waveform"""
-        t = np.linspace(0, 2*np.pi, int(self.sample_rate/frequency), endpoint=False)
-        phase_offset = phase * 2 * np.pi
-        
-        if waveform == 'saw':
-            return signal.sawtooth(t + phase_offset)
-        elif waveform == 'square':
-            return signal.square(t + phase_offset)
-        elif waveform == 'triangle':
-            return signal.sawtooth(t + phase_offset, width=0.5)
-        else:  # sine
-            return np.sin(t + phase_offset)
-            
-    def apply_filter(self, audio: np.ndarray) -> np.ndarray:
+    def apply_filter(self, audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """Apply filter with current settings"""
-        nyquist = self.sample_rate / 2
-        normalized_cutoff = np.clip(self.filter_cutoff / nyquist, 0.01, 0.99)
+        cutoff = self.filter_cutoff * self.modulation.cutoff_factor()
+        return self.filter.process(audio, cutoff, self.filter_resonance, out)
         
-        # Create filter coefficients
-        b, a = signal.butter(2, normalized_cutoff, 'low')
+    def reverb_impulse(self) -> np.ndarray:
+        """Exponentially decaying impulse response with unity DC gain"""
+        impulse = np.exp(-np.linspace(0, 10, int(self.sample_rate * self.reverb_time)))
+        return impulse / impulse.sum()
         
+    def apply_effects(self, audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Apply all effects in chain, into out if given (which may be audio itself)"""
         # Apply filter
-        filtered = signal.lfilter(b, a, audio)
-        
-        # Add resonance if needed
-        if self.filter_resonance > 1.0:
-            resonant_freq = np.sin(2 * np.pi * self.filter_cutoff * np.arange(len(audio)) / self.sample_rate)
-            filtered += resonant_freq * (self.filter_resonance - 1.0) * 0.1
-            
-        return np.clip(filtered, -1, 1)
+        audio = self.apply_filter(audio, out)
         
-    def apply_effects(self, audio: np.ndarray) -> np.ndarray:
-        """Apply all effects in chain"""
-        # Apply filter
-        audio = self.apply_filter(audio)
-        
-        # Apply reverb
+        # Apply reverb (always run so its tail keeps decaying across blocks)
+        wet = self.reverb.process(audio, self.wet_buffer.view(len(audio)))
         if self.reverb_amount > 0:
-            reverb_time = int(self.sample_rate * 0.1)  # 100ms reverb
-            impulse = np.exp(-np.linspace(0, 10, reverb_time))
-            audio = signal.convolve(audio, impulse * self.reverb_amount, mode='same')
+            wet *= self.reverb_amount
+            audio += wet
         
         # Apply delay
         if self.delay_feedback > 0:
-            delay_samples = int(self.delay_time * self.sample_rate)
-            delayed = np.zeros_like(audio)
-            for i in range(1, 4):
-                delayed = np.roll(audio, delay_samples * i) * (self.delay_feedback ** i)
-                audio += delayed
+            self.delay_line.process(audio, self.delay_time, self.delay_feedback, audio)
+        
+        # Soft clip, oversampled unless running at 'realtime' quality
+        return self.saturator.process(audio, audio)
         
-        return np.clip(audio, -1, 1)
+    def add_modulation(self, modulation: ModulationParams):
+        """Add a routing to the modulation matrix (render thread or offline use only)"""
+        self.modulations.append(modulation)
+        self.modulation.set_routings(self.modulations)
+        
+    def clear_modulations(self):
+        """Remove every modulation routing"""
+        self.modulations = []
+        self.modulation.set_routings(self.modulations)
         
+    def apply_patch(self, patch: Dict[str, object]):
+        """Apply a patch dict directly (render thread or offline use only)"""
+        for param, value in patch.items():
+            if param == 'waveform':
+                for osc in self.oscillators:
+                    osc.waveform = value
+            elif param == 'sub_levels':
+                for osc in self.oscillators:
+                    osc.sub_levels = list(value)
+            elif param in self.PARAMETERS:
+                setattr(self, param, float(value))
+            else:
+                raise ValueError(f"Unknown patch parameter: {param}")
+                
     def handle_key_press(self, key):
         """Handle keyboard input"""
         try:
@@ -157,128 +1801,227 @@ class ModernSubharmonicon:
     def play_note(self, frequency: float):
         """Play a note at the specified frequency"""
         try:
-            # Update oscillator frequencies
-            self.oscillators[0].frequency = frequency
-            self.oscillators[1].frequency = frequency * 1.5  # Fifth above
-            
-            # Generate and play audio directly
-            audio = self.generate_voice()
-            sd.play(audio, self.sample_rate, blocking=False)
-            
-            if self.is_recording:
-                self.recording_buffer.append(audio)
-                
-            print(f"Playing note: {frequency:.1f} Hz")  # Debug output
+            if self.event_queue.push(ParameterQueue.NOTE, 0, frequency):
+                print(f"Playing note: {frequency:.1f} Hz")  # Debug output
+            else:
+                print("Error playing note: event queue full")
         except Exception as e:
             print(f"Error playing note: {e}")
             
-    def generate_voice(self) -> np.ndarray:
-        """Generate audio for current oscillator settings"""
-        duration = 0.1  # 100ms buffer
-        samples = int(self.sample_rate * duration)
-        mixed = np.zeros(samples)
-        
-        # Generate main oscillators
+    def trigger_note(self, frequency: float, velocity: float = 1.0, duration: Optional[float] = None):
+        """Start a note on the render thread"""
+        # Update oscillator frequencies
         for osc in self.oscillators:
-            wave = self.generate_waveform(osc.frequency, osc.waveform, osc.phase)
-            wave = np.resize(wave, samples) * osc.level
+            osc.frequency = frequency * osc.ratio
+            
+        duration = self.note_duration if duration is None else duration
+        self.voices.note_on(frequency, int(self.sample_rate * duration), velocity)
+        
+    def send_parameter(self, param: str, value: float) -> bool:
+        """Queue a new target value for a parameter, clamped to its range (control thread)"""
+        low, high = self.PARAMETER_RANGES[param]
+        value = min(max(value, low), high)
+        self.control_values[param] = value
+        if not self.event_queue.push(ParameterQueue.SET, self.PARAMETERS.index(param), value):
+            print(f"Error setting {param}: event queue full")
+            return False
+        return True
+        
+    def process_events(self):
+        """Apply all events queued since the previous block"""
+        event = self.event_queue.pop()
+        while event is not None:
+            kind, target, value = event
+            if kind == ParameterQueue.NOTE:
+                self.root_frequency = value
+                self.trigger_note(value)
+            elif kind == ParameterQueue.SET:
+                self.gliding[self.PARAMETERS[target]] = value
+            elif kind == ParameterQueue.WAVEFORM:
+                for osc in self.oscillators:
+                    osc.waveform = WavetableBank.WAVEFORMS[target]
+            elif kind == ParameterQueue.SEQUENCE:
+                if value:
+                    self.load_default_sequence()
+                self.sequence_playing = bool(value)
+            elif kind == ParameterQueue.RECORD:
+                self.is_recording = bool(value)
+            event = self.event_queue.pop()
+            
+    def smooth_parameters(self, frames: int):
+        """Move every gliding parameter one block closer to its target"""
+        for param, target in list(self.gliding.items()):
+            coeff = 1.0 - np.exp(-frames / (self.SMOOTHING_TIMES[param] * self.sample_rate))
+            current = getattr(self, param)
+            value = current + (target - current) * coeff
+            if abs(target - value) <= 1e-4 * max(abs(target), 1.0):
+                value = target
+                del self.gliding[param]
+            setattr(self, param, value)
+                
+    def schedule_note(self, sample: int, frequency: float, duration: Optional[float] = None,
+                      velocity: float = 1.0):
+        """Queue a note to start on an exact sample of the render clock (render thread only).
+
+        A velocity of 0 releases held voices at that frequency instead.
+        """
+        # The counter keeps same-sample notes in order and keeps None durations out of comparisons
+        self.schedule_counter += 1
+        heapq.heappush(self.scheduled_notes, (sample, self.schedule_counter, frequency, duration, velocity))
+        
+    def event_clock(self) -> Optional[Tuple[float, int]]:
+        """(perf_counter time, sample) pair for timestamping live input, once audio is playing"""
+        return self.engine.event_clock if self.engine is not None else None
+        
+    def add_midi_source(self, source: MidiSource):
+        """Feed a MIDI file or port into the render loop from the next block on"""
+        self.midi_sources.append(source)
+        
+    def block_events(self, frames: int) -> List[Tuple[int, float, float, Optional[float]]]:
+        """Note triggers for this block as (offset, frequency, velocity, duration); velocity 0 is a note-off"""
+        if self.sequence_playing and not self.sequencer.running:
+            self.sequencer.start(self.sample_clock)
+        elif not self.sequence_playing and self.sequencer.running:
+            self.sequencer.stop()
             
-            # Generate subharmonics
-            for sub_level, division in zip(osc.sub_levels, [2, 3]):
-                sub_freq = osc.frequency / division
-                sub_wave = self.generate_waveform(sub_freq, osc.waveform, osc.phase)
-                sub_wave = np.resize(sub_wave, samples) * sub_level
-                wave += sub_wave
+        events = []
+        if self.sequencer.running:
+            for offset, frequency, velocity in self.sequencer.events(self.sample_clock, frames, self.sequence,
+                                                                     self.step_duration, self.root_frequency):
+                events.append((offset, frequency, velocity, None))
                 
-            mixed += wave
+        block_end = self.sample_clock + frames
+        while self.scheduled_notes and self.scheduled_notes[0][0] < block_end:
+            sample, _, frequency, duration, velocity = heapq.heappop(self.scheduled_notes)
+            events.append((max(sample - self.sample_clock, 0), frequency, velocity, duration))
             
-        # Normalize and apply effects
-        mixed = mixed / len(self.oscillators)
-        mixed = self.apply_effects(mixed)
+        for source in self.midi_sources:
+            for sample, event in source.pending(self.sample_clock, frames):
+                velocity = event.velocity / 127 if event.kind == 'note_on' else 0.0
+                frequency = midi_note_frequency(event.note)
+                if velocity > 0:
+                    self.root_frequency = frequency
+                events.append((sample - self.sample_clock, frequency, velocity, self.MIDI_HOLD))
+        events.sort(key=lambda event: event[0])
+        return events
+        
+    def render_voices(self, start: int, end: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Render samples start:end of the current block with their modulation slices"""
+        return self.voices.render(self.wavetables, self.oscillators, end - start,
+                                  self.modulation.pitch_factor(start, end),
+                                  self.modulation.sub_factor(start, end), out)
         
-        return mixed
+    def render_block(self, frames: int) -> np.ndarray:
+        """Render the next block of the continuous output stream.
+
+        The returned array is a preallocated buffer that the next call reuses.
+        """
+        self.process_events()
+        self.smooth_parameters(frames)
+        
+        self.modulation.process(frames, float(self.voices.level.max()))
+        
+        # Split voice rendering at every trigger so notes start on their exact sample
+        block = self.block_buffer.view(frames)
+        position = 0
+        for offset, frequency, velocity, duration in self.block_events(frames):
+            if offset > position:
+                self.render_voices(position, offset, block[position:offset])
+                position = offset
+            if velocity > 0:
+                self.trigger_note(frequency, velocity, duration)
+            else:
+                self.voices.note_off(frequency)
+        if position < frames:
+            self.render_voices(position, frames, block[position:])
+            
+        level = self.modulation.level_factor()
+        if level is not None:
+            block *= level
+        self.apply_effects(block, block)
+        self.sample_clock += frames
+        
+        if self.is_recording != (self.recorder is not None):
+            self.update_recorder()
+        if self.recorder is not None:
+            self.recorder.write(block)
+        return block
+        
+    def update_recorder(self):
+        """Open or finish the recording file to follow is_recording (render thread)"""
+        if self.is_recording:
+            self.recorder = WavWriter(self.recording_path, self.sample_rate)
+        else:
+            self.recorder.close()
+            self.recorder = None
         
     def cycle_waveform(self):
         """Cycle through available waveforms"""
-        waveforms = ['saw', 'square', 'triangle', 'sine']
-        current = self.oscillators[0].waveform
+        waveforms = WavetableBank.WAVEFORMS
+        current = self.control_values['waveform']
         next_idx = (waveforms.index(current) + 1) % len(waveforms)
         new_waveform = waveforms[next_idx]
         
-        for osc in self.oscillators:
-            osc.waveform = new_waveform
+        self.control_values['waveform'] = new_waveform
+        self.event_queue.push(ParameterQueue.WAVEFORM, next_idx, 0.0)
             
         print(f"Waveform: {new_waveform}")
         
     def cycle_effects(self):
         """Cycle through effect combinations"""
-        if self.filter_cutoff > 1000:  # Current: No effects
-            self.filter_cutoff = 800
-            self.reverb_amount = 0
+        if self.control_values['filter_cutoff'] > 1000:  # Current: No effects
+            self.send_parameter('filter_cutoff', 800)
+            self.send_parameter('reverb_amount', 0)
             print("Effects: Filter")
-        elif self.reverb_amount == 0:  # Current: Filter only
-            self.filter_cutoff = 2000
-            self.reverb_amount = 0.3
+        elif self.control_values['reverb_amount'] == 0:  # Current: Filter only
+            self.send_parameter('filter_cutoff', 2000)
+            self.send_parameter('reverb_amount', 0.3)
             print("Effects: Reverb")
-        elif self.filter_cutoff > 1000:  # Current: Reverb only
-            self.filter_cutoff = 800
-            self.reverb_amount = 0.3
+        elif self.control_values['filter_cutoff'] > 1000:  # Current: Reverb only
+            self.send_parameter('filter_cutoff', 800)
+            self.send_parameter('reverb_amount', 0.3)
             print("Effects: Filter + Reverb")
         else:  # Current: Both
-            self.filter_cutoff = 2000
-            self.reverb_amount = 0
+            self.send_parameter('filter_cutoff', 2000)
+            self.send_parameter('reverb_amount', 0)
             print("Effects: None")
             
     def toggle_recording(self):
-        """Toggle recording state"""
-        self.is_recording = not self.is_recording
-        if self.is_recording:
-            self.recording_buffer = []
-            print("Recording started...")
+        """Toggle recording; the render thread streams every block to the file"""
+        recording = not self.control_values['recording']
+        if recording:
+            self.recording_path = time.strftime("recording_%Y%m%d_%H%M%S.wav")
+        if not self.event_queue.push(ParameterQueue.RECORD, 0, 1.0 if recording else 0.0):
+            print("Error toggling recording: event queue full")
+            return
+        self.control_values['recording'] = recording
+        if recording:
+            print(f"Recording to {self.recording_path}...")
         else:
-            if len(self.recording_buffer) > 0:
-                # Save recording buffer to sequence
-                recorded = np.concatenate(self.recording_buffer)
-                # TODO: Implement quantization and sequence conversion
-                print("Recording stopped. Length:", len(recorded)/self.sample_rate, "seconds")
+            print(f"Recording stopped, saved to {self.recording_path}")
             
+    def load_default_sequence(self):
+        """Set up a simple sequence if empty"""
+        if not np.any(self.sequence):
+            for i in range(self.sequence_length):
+                self.sequence[i, 0] = 1.0 if i % 4 == 0 else 0.0
+                self.sequence[i, 1] = 1.0 if i % 3 == 0 else 0.0
+                
     def toggle_sequence(self):
         """Toggle sequence playback"""
-        self.sequence_playing = not self.sequence_playing
-        if self.sequence_playing:
-            # Set up a simple sequence if empty
-            if not np.any(self.sequence):
-                for i in range(self.sequence_length):
-                    self.sequence[i, 0] = 1.0 if i % 4 == 0 else 0.0
-                    self.sequence[i, 1] = 1.0 if i % 3 == 0 else 0.0
+        playing = not self.control_values['sequence_playing']
+        self.control_values['sequence_playing'] = playing
+        self.event_queue.push(ParameterQueue.SEQUENCE, 0, 1.0 if playing else 0.0)
+        if playing:
             print("Sequence: Playing")
         else:
             print("Sequence: Stopped")
             
     def adjust_parameter(self, param: str, amount: float):
         """Adjust a parameter by the specified amount"""
-        current = getattr(self, param)
-        setattr(self, param, current + amount)
-        print(f"{param}: {getattr(self, param):.2f}")
-        
-    def audio_processor(self):
-        """Main audio processing loop"""
-        print("Audio processor started")  # Debug output
-        while self.is_playing:
-            try:
-                if self.sequence_playing:
-                    # Play sequence
-                    if np.any(self.sequence[self.current_step]):
-                        audio = self.generate_voice()
-                        sd.play(audio, self.sample_rate, blocking=False)
-                        print(f"Playing sequence step {self.current_step}")  # Debug output
-                    self.current_step = (self.current_step + 1) % self.sequence_length
-                    time.sleep(self.step_duration)
-                else:
-                    time.sleep(0.01)  # Small delay to prevent CPU overload
-            except Exception as e:
-                print(f"Audio processing error: {e}")
-                
+        self.send_parameter(param, self.control_values[param] + amount)
+        print(f"{param}: {self.control_values[param]:.2f}")
+        
     def start(self):
         """Start the synth"""
         print("\nModern Subharmonicon")
@@ -292,11 +2035,9 @@ class ModernSubharmonicon:
         print("  Arrow keys: Adjust filter (↑↓) and reverb (←→)")
         print("  Esc: Quit")
         
-        self.is_playing = True
-        
-        # Start audio processing thread
-        self.audio_thread = threading.Thread(target=self.audio_processor)
-        self.audio_thread.start()
+        # Open the persistent output stream
+        self.engine = AudioEngine(self)
+        self.engine.start()
         
         # Set up keyboard hooks
         for key in self.key_to_freq:
@@ -310,11 +2051,106 @@ class ModernSubharmonicon:
         
     def cleanup(self):
         """Clean up resources"""
-        self.is_playing = False
         self.sequence_playing = False
-        time.sleep(0.5)  # Allow threads to finish
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
+        if self.recorder is not None:
+            self.is_recording = False
+            self.update_recorder()
         print("\nShutting down...")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modern Subharmonicon")
+    parser.add_argument('--render', metavar='PATH', help="Render the default sequence offline to a .wav or .npy file")
+    parser.add_argument('--repeats', type=int, default=4, help="Sequence repeats for --render")
+    parser.add_argument('--divisors', metavar='D1,D2,D3,D4',
+                        help="Clock divisor of each sequencer track, e.g. 1,2,3,4 (default all 1)")
+    parser.add_argument('--ratios', metavar='R1,R2,R3,R4',
+                        help="Pitch of each sequencer track relative to the root note, e.g. 1,1.5,2,0.5")
+    parser.add_argument('--quality', choices=list(Saturator.QUALITY), default='realtime',
+                        help="Saturation oversampling quality")
+    parser.add_argument('--benchmark', metavar='PATH', nargs='?', const='-',
+                        help="Run the headless DSP benchmark and write JSON to PATH (default: stdout)")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Audio rendered per benchmark scenario")
+    parser.add_argument('--check-allocations', action='store_true',
+                        help="Check that steady-state blocks allocate no audio buffers (exit status 1 if they do)")
+    parser.add_argument('--check-convolver', action='store_true',
+                        help="Check the reverb convolution against np.convolve (exit status 1 if it differs)")
+    parser.add_argument('--batch', metavar='PATH', help="Render a waveform x cutoff x reverb x sub level grid to a .npy file")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for --batch")
+    parser.add_argument('--midi', metavar='FILE',
+                        help="Replay a Standard MIDI File offline to --render PATH (default midi_render.wav)")
+    parser.add_argument('--midi-port', metavar='NAME', nargs='?', const='',
+                        help="Play live from a MIDI input port (needs mido), default port if NAME is omitted")
+    args = parser.parse_args()
+    
     synth = ModernSubharmonicon()
-    synth.start()
\ No newline at end of file
+    synth.saturator.set_quality(args.quality)
+    try:
+        synth.sequencer.set_rhythm(
+            [int(value) for value in args.divisors.split(',')] if args.divisors else None,
+            [float(value) for value in args.ratios.split(',')] if args.ratios else None)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.benchmark:
+        report = SynthBenchmark(seconds=args.seconds).run()
+        if args.benchmark == '-':
+            print(json.dumps(report, indent=2))
+        else:
+            with open(args.benchmark, 'w') as f:
+                json.dump(report, f, indent=2)
+            for scenario in report['scenarios']:
+                print(f"{scenario['waveform']:>8} {scenario['effects']:<14} "
+                      f"{scenario['realtime_factor']:6.1f}x real time, "
+                      f"worst block {scenario['worst_block_us'] / 1000:.2f} ms")
+            print(f"Modulation: {report['modulation']['us_per_routing']:.2f} us per routing per block")
+    elif args.check_allocations:
+        result = SynthBenchmark().check_allocations()
+        for scenario in result['scenarios']:
+            print(f"{scenario['waveform']:>8} {scenario['effects']:<14} "
+                  f"peak {scenario['max_alloc_bytes_per_block']:.0f} bytes per block")
+        verdict = "passed" if result['passed'] else "FAILED"
+        print(f"Allocation check {verdict}: worst {result['worst_bytes_per_block']:.0f} bytes "
+              f"(limit {result['limit_bytes']})")
+        raise SystemExit(0 if result['passed'] else 1)
+    elif args.check_convolver:
+        result = SynthBenchmark().check_convolver()
+        verdict = "passed" if result['passed'] else "FAILED"
+        print(f"Convolver check {verdict}: max error {result['max_error']:.3g} over {result['chunks']} chunks "
+              f"(tolerance {result['tolerance']:.3g})")
+        raise SystemExit(0 if result['passed'] else 1)
+    elif args.batch:
+        batch = BatchRenderer(max_workers=args.workers)
+        patches = batch.patch_grid(waveform=WavetableBank.WAVEFORMS, filter_cutoff=[500, 1000, 2000, 4000],
+                                   reverb_amount=[0.0, 0.3], sub_levels=[[0.0, 0.0], [0.3, 0.3]])
+        started = time.perf_counter()
+        np.save(args.batch, batch.render(patches))
+        elapsed = time.perf_counter() - started
+        print(f"Rendered {len(patches)} patches to {args.batch} in {elapsed:.1f} s "
+              f"({len(patches) / elapsed:.1f} patches/s)")
+    elif args.midi:
+        midi_file = MidiFile(args.midi)
+        path = args.render or 'midi_render.wav'
+        renderer = OfflineRenderer(synth)
+        samples = renderer.render_midi(midi_file, path)
+        print(f"Rendered {midi_file.note_count()} notes ({samples / synth.sample_rate:.1f} s) to {path} "
+              f"at {renderer.realtime_factor:.1f}x real time")
+        print(f"Peak voices: {synth.voices.peak_count}/{synth.voices.num_voices}, "
+              f"stolen: {synth.voices.voices_stolen}, "
+              f"worst block: {renderer.worst_block_seconds * 1000:.2f} ms "
+              f"(budget {synth.buffer_size / synth.sample_rate * 1000:.2f} ms)")
+    elif args.render:
+        synth.load_default_sequence()
+        renderer = OfflineRenderer(synth)
+        samples = renderer.render_sequence(args.render, repeats=args.repeats)
+        print(f"Rendered {samples / synth.sample_rate:.1f} s to {args.render} "
+              f"({renderer.realtime_factor:.1f}x real time)")
+    else:
+        if args.midi_port is not None:
+            try:
+                synth.add_midi_source(MidiPortSource(synth.sample_rate, args.midi_port or None,
+                                                     clock=synth.event_clock))
+            except Exception as e:
+                print(f"Error opening MIDI input: {e}")
+        synth.start()
\ No newline at end of file